@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Times the scheduler on made up jobs, so that speedups (and slowdowns) can be tracked.
+
+	python benchmark.py --jobs 6 --experiments 3 --tasks 4 --events 0.3
+
+The jobs and existing events are generated from a seed, so the same arguments always give the same problem. For
+each run this reports:
+- how long decoding one chromosome takes with each engine (the grid, intervals and bitsets), and how many
+  evaluations and schedule slots per second that comes to
+- how long a full run of the genetic algorithm takes, and how many chromosomes it scored per second
+- the peak memory allocated by python while doing each of those
+
+Add --legacy to time the original generate_schedule too (slow!), and --output to append the results to a file of
+JSON lines.
+'''
+
+import argparse
+import datetime
+import json
+import random
+import time
+import tracemalloc
+
+import pytz
+
+import bitset_engine
+import ga_config
+import genetic_scheduler as gs
+import interval_engine
+import job_table
+import schedule_engine
+
+def pick(rng, value):
+	'''value is either a number, or a (lowest, highest) range to pick one from'''
+	if isinstance(value, (tuple, list)):
+		return rng.randint(value[0], value[1])
+	return value
+
+def synthetic_jobs(n_jobs=4, n_experiments=(1, 4), n_tasks=(1, 4), flexible=0.5, inactive=0.5, max_time=48,
+	workday_length=gs.get_5_min_time(8, 0), seed=0):
+	'''Makes jobs in the same form as read_job_file.
+	n_experiments and n_tasks are per job and per experiment, and can be a number or a (lowest, highest) range.
+	flexible and inactive are the fractions of experiments that are flexible, and of tasks that are inactive.
+	Times are in slots, up to max_time each. An inflexible experiment has to go in all at once, so its tasks are
+	kept short enough to fit in one working day, or it would never fit at all.'''
+	rng = random.Random(seed)
+
+	jobs = []
+	for j in range(n_jobs):
+		job = {'order': []}
+		for e in range(pick(rng, n_experiments)):
+			exp_name = 'Experiment %d' % e
+			is_flexible = int(rng.random() < flexible)
+
+			experiment = []
+			n = pick(rng, n_tasks)
+			longest = min(max_time, workday_length) if is_flexible else max(1, workday_length // n)
+			for t in range(n):
+				experiment.append({
+					'name': 'Task %d' % t,
+					'time': rng.randint(1, min(max_time, longest)),
+					'active': int(rng.random() >= inactive),
+					'flexible': is_flexible,
+					})
+
+			job['order'].append(exp_name)
+			job[exp_name] = experiment
+		jobs.append(job)
+
+	return jobs
+
+def synthetic_events(density=0.2, days=14, workday_start=gs.get_5_min_time(8, 0),
+	workday_end=gs.get_5_min_time(16, 0), longest=gs.get_5_min_time(2, 0), seed=0):
+	'''Makes existing events in the same form as parse_ical_event, covering roughly density of the working hours
+	in the first few days. Some of them will overlap, just like a real calendar.'''
+	rng = random.Random(seed)
+	day_length = gs.get_5_min_time(24, 0)
+
+	# Working days only
+	workdays = [day for day in range(days) if day % 7 < 5]
+	n_events = int(density * len(workdays) * (workday_end-workday_start) / ((1 + longest) / 2.))
+
+	events = []
+	for k in range(n_events):
+		length = rng.randint(1, longest)
+		day = rng.choice(workdays)
+		events.append({
+			'name': 'Event %d' % k,
+			'time': float(length),
+			'active': 1,
+			'flexible': 0,
+			'first_slot': day*day_length + rng.randint(workday_start, max(workday_start, workday_end-length)),
+			})
+
+	return events
+
+def random_chromosomes(n_genes, n_jobs, n_chromosomes, seed=0):
+	rng = random.Random(seed)
+	return [[rng.randint(0, n_jobs-1) for i in range(n_genes)] for j in range(n_chromosomes)]
+
+def measure(function, *args):
+	'''Runs function twice: once to time it, then again to find its peak memory use, which tracemalloc slows down.
+	returns:
+	result, seconds, peak_bytes
+	'''
+	t0 = time.time()
+	result = function(*args)
+	seconds = time.time() - t0
+
+	tracemalloc.start()
+	function(*args)
+	size, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+
+	return result, seconds, peak
+
+def decode_all(generate, chromosomes, work_hours):
+	'''Decodes each chromosome, and counts how many slots were scheduled'''
+	slots = 0
+	for permutation in chromosomes:
+		slots += generate(permutation, work_hours)
+	return slots
+
+def benchmark(args):
+	initial_date  = datetime.datetime(2018, 9, 3).replace(tzinfo=pytz.timezone('Europe/London'))
+	workday_start = gs.get_5_min_time( 8,00)
+	workday_end   = gs.get_5_min_time(16,00)
+	work_hours    = 2*24
+
+	jobs = synthetic_jobs(args.jobs, args.experiments, args.tasks, args.flexible, args.inactive, args.max_time,
+		workday_end-workday_start, args.seed)
+	existing_jobs = synthetic_events(args.events, args.days, workday_start, workday_end, seed=args.seed)
+
+	n_genes = job_table.count_genes(jobs)
+	chromosomes = random_chromosomes(n_genes, len(jobs), args.chromosomes, args.seed)
+
+	results = {
+		'jobs': args.jobs, 'experiments': args.experiments, 'tasks': args.tasks, 'flexible': args.flexible,
+		'inactive': args.inactive, 'events': args.events, 'seed': args.seed, 'genes': n_genes,
+		'n_events': len(existing_jobs),
+		}
+	print('%d jobs, %d genes per chromosome, %d existing events' % (len(jobs), n_genes, len(existing_jobs)))
+
+	# Decoding with the engine, set up once as the evaluators do
+	engine = schedule_engine.GridEngine(jobs, existing_jobs, initial_date, workday_start, workday_end)
+	def engine_generate(permutation, work_hours):
+		grid, skipped_tasks = engine.generate_schedule(permutation, work_hours)
+		return grid.shape[1]
+	report(results, 'engine', chromosomes, *measure(decode_all, engine_generate, chromosomes, work_hours))
+
+	# The same again with intervals, which is what the evaluators use
+	intervals = interval_engine.IntervalEngine(jobs, existing_jobs, initial_date, workday_start, workday_end)
+	def interval_generate(permutation, work_hours):
+		schedule, skipped_tasks, checkpoints, end = intervals.decode(permutation, work_hours)
+		return schedule.n_slots
+	report(results, 'interval', chromosomes, *measure(decode_all, interval_generate, chromosomes, work_hours))
+
+	bitsets = bitset_engine.BitsetEngine(jobs, existing_jobs, initial_date, workday_start, workday_end)
+	def bitset_generate(permutation, work_hours):
+		schedule, skipped_tasks, checkpoints, end = bitsets.decode(permutation, work_hours)
+		return schedule.n_slots
+	report(results, 'bitset', chromosomes, *measure(decode_all, bitset_generate, chromosomes, work_hours))
+
+	# The original decoder, which builds everything from scratch for each chromosome
+	if args.legacy:
+		def legacy_generate(permutation, work_hours):
+			job_schedules, skipped_tasks = gs.generate_schedule(
+				initial_date, existing_jobs, jobs, permutation, workday_start, workday_end, 0, work_hours)
+			return len(job_schedules[0])
+		legacy = chromosomes[:args.legacy_chromosomes]
+		report(results, 'legacy', legacy, *measure(decode_all, legacy_generate, legacy, work_hours))
+
+	# A whole run of the genetic algorithm
+	config = ga_config.GAConfig(n_individuals=args.population, max_generations=args.max_generations)
+	(best_individual, history), seconds, peak = measure(
+		gs.optimise, jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours, args.workers,
+		args.seed, 0, config)
+	evaluations = history['evaluations']
+	results['ga'] = {
+		'seconds': seconds,
+		'generations': history.get('generations', 0),
+		'evaluations': evaluations,
+		'evaluations_per_second': evaluations / seconds,
+		'best': min(history['best_scores']) if history['best_scores'] else None,
+		'peak_bytes': peak,
+		}
+	print('GA:     %6.2lfs for %d generations, %d evaluations (%.1lf/s), best %s, peak %.1lf MB' % (
+		seconds, results['ga']['generations'], evaluations, evaluations/seconds, results['ga']['best'],
+		peak/1024.**2))
+
+	return results
+
+def report(results, name, chromosomes, slots, seconds, peak):
+	per_chromosome = seconds / len(chromosomes)
+	results[name] = {
+		'chromosomes': len(chromosomes),
+		'seconds_per_chromosome': per_chromosome,
+		'evaluations_per_second': 1. / per_chromosome,
+		'slots_per_second': slots / seconds,
+		'peak_bytes': peak,
+		}
+	print('%-9s %8.2lfms per chromosome (%.1lf/s), %.0lf slots/s, peak %.1lf MB' % (
+		name+':', 1000*per_chromosome, 1./per_chromosome, slots/seconds, peak/1024.**2))
+
+def span(text):
+	'''Parses "3" or "1-4" into 3 or (1, 4)'''
+	if '-' in text:
+		low, high = text.split('-')
+		return (int(low), int(high))
+	return int(text)
+
+def main():
+	parser = argparse.ArgumentParser(description='Times the scheduler on synthetic jobs.')
+	parser.add_argument('--jobs', type=int, default=4, help='number of jobs')
+	parser.add_argument('--experiments', type=span, default=(1, 4), help='experiments per job, e.g. 3 or 1-4')
+	parser.add_argument('--tasks', type=span, default=(1, 4), help='tasks per experiment, e.g. 3 or 1-4')
+	parser.add_argument('--flexible', type=float, default=0.5, help='fraction of experiments that are flexible')
+	parser.add_argument('--inactive', type=float, default=0.5, help='fraction of tasks that are inactive')
+	parser.add_argument('--max-time', type=int, default=48, help='longest task, in 5 minute slots')
+	parser.add_argument('--events', type=float, default=0.2,
+		help='fraction of the working hours already taken by existing events')
+	parser.add_argument('--days', type=int, default=14, help='number of days to spread the existing events over')
+	parser.add_argument('--chromosomes', type=int, default=50, help='number of chromosomes to decode')
+	parser.add_argument('--legacy', action='store_true', help='also time the original generate_schedule')
+	parser.add_argument('--legacy-chromosomes', type=int, default=3,
+		help='number of chromosomes to decode with the original generate_schedule')
+	parser.add_argument('--workers', type=int, default=1, help='processes for the genetic algorithm to use')
+	parser.add_argument('--population', type=int, default=20, help='individuals in each generation of the GA')
+	parser.add_argument('--max-generations', type=int, default=None, help='stop the GA after this many generations')
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--output', help='append the results to this file, as a line of JSON')
+	args = parser.parse_args()
+
+	results = benchmark(args)
+	results['date'] = datetime.datetime.now().isoformat()
+
+	if args.output:
+		with open(args.output, 'a') as f:
+			f.write(json.dumps(results) + '\n')
+
+if __name__ == '__main__':
+	main()
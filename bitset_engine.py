@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+A decoder that keeps track of the busy slots as one big bitset.
+
+All that placing a block really needs to know is whether anything active is in each slot already. Here that's a
+single python int, busy, with bit s set if slot s is taken by something active (the calendar's nights, weekends
+and active events included). Each block's active slots are another int, its mask, worked out once for each task.
+Then whether a block fits at slot i is one shift and AND,
+
+	(busy >> i) & mask == 0
+
+and if it doesn't, the lowest bit of that AND says where it clashed. Scanning on from there for the first free bit
+finds where the busy stretch it hit ends, and the block jumps straight past it, just like IntervalEngine does.
+
+Python ints are arbitrary precision, so the bitset is as long as the schedule needs, and copying one for a
+checkpoint is free, since ints never change. Everything else (the records of where each task went, and the
+placement rules) is IntervalEngine's, so the schedules and scores are exactly the same as GridEngine's.
+'''
+
+import numpy as np
+
+import interval_engine
+import job_table
+
+def to_bits(flags):
+	'''Packs an array of flags into an int, with flags[0] as the lowest bit'''
+	return int.from_bytes(np.packbits(np.asarray(flags, dtype=bool), bitorder='little').tobytes(), 'little')
+
+class BitsetSchedule(interval_engine.IntervalSchedule):
+	'''Everything a decode has placed so far. covered is how far along the calendar has been put into busy.'''
+
+	def __init__(self, n_jobs, n_slots):
+		self.records = [[] for job_index in range(n_jobs)]
+		self.busy    = 0
+		self.covered = 0
+		self.n_slots = n_slots
+
+	def copy(self):
+		schedule = BitsetSchedule(0, self.n_slots)
+		schedule.records = [list(records) for records in self.records]
+		schedule.busy    = self.busy
+		schedule.covered = self.covered
+		return schedule
+
+	def nbytes(self):
+		n_records = sum(len(records) for records in self.records)
+		return interval_engine.RECORD_BYTES * n_records + self.busy.bit_length() // 8
+
+	def add_busy(self, start, stop):
+		self.busy |= ((1 << (stop-start)) - 1) << start
+
+	def remove_busy(self, start, stop):
+		self.busy &= ~(((1 << (stop-start)) - 1) << start)
+
+class BitsetEngine(interval_engine.IntervalEngine):
+	'''Decodes chromosomes just like IntervalEngine, but with the busy slots as a bitset'''
+
+	def __init__(self, jobs, existing_jobs, initial_date, workday_start, workday_end):
+		super(BitsetEngine, self).__init__(jobs, existing_jobs, initial_date, workday_start, workday_end)
+
+		# Each block's active slots as a mask, and for each of them, how far into the block its run of active
+		# slots starts
+		self._mask      = []
+		self._run_start = []
+		for footprint in self.footprints:
+			run_start = [0] * footprint.length
+			mask = 0
+			for offset, length in footprint.active_runs:
+				run_start[offset:offset+length] = [offset] * length
+				mask |= ((1 << length) - 1) << offset
+			self._mask.append(mask)
+			self._run_start.append(run_start)
+
+		# The calendar's busy slots, worked out from the template whenever that gets longer
+		self._calendar_bits = 0
+		self._bits_length   = -1
+
+	def calendar_bits(self, stop):
+		'''Returns the busy slots of the calendar as a bitset, covering at least up to stop'''
+		self.template(0, stop)
+		if len(self._template_active) != self._bits_length:
+			self._calendar_bits = to_bits(self._template_active > 0)
+			self._bits_length   = len(self._template_active)
+		return self._calendar_bits
+
+	def empty_schedule(self, work_hours):
+		return BitsetSchedule(self.n_jobs, job_table.get_5_min_time(work_hours))
+
+	def first_fit(self, schedule, starter, start, stop):
+		'''Returns the first slot in range(start, stop) where starter's block can go without any of its active
+		slots landing on anything busy, or None if there isn't one'''
+		mask = self._mask[starter]
+		run_start = self._run_start[starter]
+
+		# The calendar never changes under a schedule, so its busy slots only need adding in once. Every shift copies
+		# the whole bitset, so it's kept no longer than it needs to be, and extended a week at a time.
+		covered = stop + mask.bit_length()
+		if covered > schedule.covered:
+			covered += self.week_length
+			schedule.busy |= self.calendar_bits(covered) & ((1 << covered) - 1)
+			schedule.covered = covered
+		busy = schedule.busy
+
+		i = start
+		while i < stop:
+			clash = (busy >> i) & mask
+			if not clash:
+				return i
+			# The run of active slots that clashed has to start after the busy stretch it hit. x & -x is just the
+			# lowest set bit of x.
+			offset = (clash & -clash).bit_length() - 1
+			free = ~busy >> (i+offset)
+			i += (free & -free).bit_length() - 1 + offset - run_start[offset]
+		return None
+
+	def mark_busy(self, schedule, starter, i):
+		schedule.busy |= self._mask[starter] << i
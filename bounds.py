@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Lower bounds on how long any schedule for a set of jobs has to be, so the searches can tell when they've found the
+best schedule there is, and stop.
+
+Two things hold for every schedule the decoder can make:
+- chain:    each job can finish no earlier than it would if it had the calendar to itself. Tasks are placed at
+            the first slot they fit in, after the previous task in their job, so having other jobs in the way can
+            only push them later. This covers inflexible experiments, which have to find a gap big enough for the
+            whole experiment, and the existing events in the calendar.
+- capacity: no two active tasks can share a slot, or go in a night, a weekend or an active existing event. So
+            the schedule has to be long enough for the free slots in it to hold all of the active tasks end to
+            end. (Tasks never start in slot 0, so it doesn't count.)
+
+Both are bounds on the makespan, the slot after the last task ends, which is what every schedule is scored by.
+'''
+
+import time
+
+import numpy as np
+
+import schedule_engine
+from job_table import EMPTY, NONE
+
+def chain_bound(jobs, existing_jobs, initial_date, workday_start, workday_end):
+	'''The latest that any job finishes, when each one is scheduled on its own. Jobs that can never fit are left
+	out, as there's no schedule to bound.'''
+	bound = 0
+	for job in jobs:
+		engine = schedule_engine.GridEngine([job], existing_jobs, initial_date, workday_start, workday_end)
+		grid, skipped_tasks = engine.generate_schedule([0]*sum(engine.job_genes), 24)
+		used = np.flatnonzero(grid[0] != EMPTY)
+		if len(used) and not skipped_tasks:
+			bound = max(bound, int(used[-1]) + 1)
+	return bound
+
+def capacity_bound(engine):
+	'''The shortest schedule with enough free slots for all of the active tasks, one after another. This counts the
+	active slots in the blocks that each job actually places, as a task can be left out of an inflexible block if
+	the tasks around it are set up oddly. If the calendar never has a free working slot, nothing can ever be
+	scheduled, and this gives up with 0, which is no bound at all.'''
+	table = engine.table
+	n_active = 0
+	for code in table.job_first.tolist():
+		while code != NONE:
+			footprint = engine.footprints[code]
+			n_active += sum(length for offset, length in footprint.active_runs)
+			code = footprint.next_task
+	if not n_active:
+		return 0
+
+	# Look through the calendar a week at a time until there's room. Once it's past the last event, every week is
+	# the same, so if a week there doesn't free up anything, no week ever will.
+	stop = engine.week_length
+	n_free = 0
+	while True:
+		row, row_active = engine.template(0, stop)
+		free = np.flatnonzero(row_active[1:] == 0) + 1
+		if len(free) >= n_active:
+			return int(free[n_active-1]) + 1
+		if stop - engine.week_length >= engine.events_end and len(free) == n_free:
+			return 0
+		n_free = len(free)
+		stop += engine.week_length
+
+def makespan_bound(jobs, existing_jobs, initial_date, workday_start, workday_end, engine=None):
+	'''A lower bound on the makespan of any schedule for these jobs. engine is a GridEngine for them, if there's
+	one to hand.
+	returns:
+	bound, parts
+	parts has each of the bounds that went into it, by name.'''
+	if engine == None:
+		engine = schedule_engine.GridEngine(jobs, existing_jobs, initial_date, workday_start, workday_end)
+	parts = {
+		'chain': chain_bound(jobs, existing_jobs, initial_date, workday_start, workday_end),
+		'capacity': capacity_bound(engine),
+		}
+	return max(parts.values()), parts
+
+def fitness_bound(jobs, existing_jobs, initial_date, workday_start, workday_end):
+	'''A lower bound on the fitness of any chromosome for these jobs. The fitness is the makespan, so this is just
+	makespan_bound without the parts.'''
+	bound, parts = makespan_bound(jobs, existing_jobs, initial_date, workday_start, workday_end)
+	return bound
+
+def spread(scores, bound):
+	'''The standard deviation of scores, as a fraction of how far the best of them is above bound. Makespans only
+	vary by a few percent of their size, so this measures the spread against how much room there is left to
+	improve. A cohort that's reached the bound has nowhere left to go, so it has no spread.'''
+	best = min(scores)
+	if best <= bound:
+		return 0.
+	return float(np.std(scores)) / (best - bound)
+
+def gap(best, bound):
+	'''How far best is above bound, as a fraction of bound'''
+	if best == None:
+		return float('inf')
+	if not bound:
+		return 0. if not best else float('inf')
+	return float(best - bound) / bound
+
+class SearchProgress(object):
+	'''The bookkeeping that every search does the same way: the lower bound to stop at, how far the best so far is
+	from it, and how long the search has taken. The clock starts when it's made. It all goes in history:
+	bound                           - the lower bound
+	gaps                            - the gap (see gap) after each generation, as record_gap is called
+	seconds, evaluations_per_second - once finish is called, from history['evaluations']'''
+
+	def __init__(self, jobs, existing_jobs, initial_date, workday_start, workday_end, history, debug=0):
+		# Nothing can score better than this, so stop if we get there
+		self.bound = fitness_bound(jobs, existing_jobs, initial_date, workday_start, workday_end)
+		self.history = history
+		history['bound'] = self.bound
+		history['gaps'] = []
+		if debug:
+			print('Lower bound - %d' % self.bound)
+		self.t_start = time.time()
+
+	def seconds(self):
+		return time.time() - self.t_start
+
+	def record_gap(self, best):
+		'''Adds how far best is from the bound to the history, and returns it'''
+		self.history['gaps'].append(gap(best, self.bound))
+		return self.history['gaps'][-1]
+
+	def stop_reason(self, config, generation, stale, spread, best):
+		'''Checks the stopping rules in config (a GAConfig), against the evaluations so far, the time taken and the
+		bound'''
+		return config.stop_reason(
+			generation, stale, spread, self.history['evaluations'], self.seconds(), best, self.bound)
+
+	def finish(self):
+		'''Stops the clock, and returns how long the search took'''
+		seconds = self.seconds()
+		self.history['seconds'] = seconds
+		self.history['evaluations_per_second'] = self.history['evaluations'] / seconds if seconds else 0.
+		return seconds
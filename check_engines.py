@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Checks that every engine decodes chromosomes exactly the same way, so a change to one of them can be checked before
+it goes in.
+
+	python check_engines.py --trials 200
+
+For each trial this makes some jobs and existing events from the seed, and decodes random chromosomes with the
+GridEngine, and with each of the engines built on it (IntervalEngine and BitsetEngine). They all have to give
+the same grid, the same skipped tasks and the same score, with and without a cutoff, and with checkpoints
+(IncrementalDecoder). The jobs come from benchmark.synthetic_jobs, and from awkward_jobs, which has the odd cases:
+tasks that take no time at all, experiments with some tasks flexible and some not, and tasks too long to ever fit.
+The working day moves around too, including one that takes up the whole day, and one that ends before it starts.
+
+The first few trials (--legacy-trials) are also decoded by the original generate_schedule, which is slow. These
+keep to what the original can cope with: the 8 till 4 working day that run_scheduler uses, experiments that are
+all flexible or all not, and no events that start before the schedule does (it wraps those round to the end).
+It never grows the schedule, so it's given the length the GridEngine grew to, and has to come up with the same
+schedule, without skipping anything.
+
+Last of all, a set of jobs with over a thousand genes goes through every engine, and a generation of the genetic
+algorithm with debugging on, as there are far too many chromosomes to count in a float by then.
+
+Prints each mismatch, and exits with 1 if there were any.
+'''
+
+import argparse
+import contextlib
+import datetime
+import io
+import random
+import sys
+
+import pytz
+
+import benchmark
+import bitset_engine
+import evaluator
+import ga_config
+import genetic_scheduler as gs
+import interval_engine
+import schedule_engine
+
+# (workday_start, workday_end) pairs to try, in slots. The first is the one run_scheduler uses.
+WORKDAYS = [(96, 192), (0, 288), (0, 200), (100, 288), (30, 31), (150, 100), (60, 250)]
+
+def awkward_jobs(rng, n_jobs, mixed=True):
+	'''Makes jobs in the same form as read_job_file, with the cases synthetic_jobs steers clear of. mixed lets the
+	tasks in an experiment be a mix of flexible and not.'''
+	jobs = []
+	for j in range(n_jobs):
+		job = {'order': []}
+		for e in range(rng.randint(1, 4)):
+			exp_name = 'Experiment %d' % e
+			flexible = rng.random() < 0.5
+			experiment = []
+			for t in range(rng.randint(1, 4)):
+				experiment.append({
+					'name': 'Task %d' % t,
+					'time': rng.choice([rng.randint(0, 12), rng.randint(0, 100)]),
+					'active': int(rng.random() < 0.5),
+					'flexible': int(flexible if not mixed or rng.random() < 0.7 else not flexible),
+					})
+			job['order'].append(exp_name)
+			job[exp_name] = experiment
+		jobs.append(job)
+	return jobs
+
+def awkward_events(rng, n_events, span=2000, early=True):
+	'''Makes existing events, some of them active, and if early, some starting before the schedule does'''
+	events = []
+	for k in range(n_events):
+		events.append({
+			'name': 'Event %d' % k,
+			'time': float(rng.randint(1, 30)),
+			'active': rng.random() < 0.7,
+			'flexible': 0,
+			'first_slot': rng.randint(-200 if early else 0, span),
+			})
+	return events
+
+def same_grid(a, b):
+	if a is None or b is None:
+		return a is None and b is None
+	return a.shape == b.shape and (a == b).all()
+
+def check_trial(trial, rng, initial_date, n_chromosomes, legacy):
+	'''Decodes n_chromosomes random chromosomes with every engine.
+	returns:
+	a list of what didn't match'''
+	if trial % 2:
+		jobs = awkward_jobs(rng, rng.randint(1, 4), mixed=not legacy)
+		existing_jobs = awkward_events(rng, rng.randint(0, 20), early=not legacy)
+	else:
+		jobs = benchmark.synthetic_jobs(rng.randint(1, 5), inactive=rng.random(), seed=trial)
+		existing_jobs = benchmark.synthetic_events(rng.random()*0.6, seed=trial)
+	workday_start, workday_end = WORKDAYS[0] if legacy else rng.choice(WORKDAYS)
+	work_hours = rng.choice([24, 48])
+
+	args = (jobs, existing_jobs, initial_date, workday_start, workday_end)
+	grid_engine = schedule_engine.GridEngine(*args)
+	engines = [interval_engine.IntervalEngine(*args), bitset_engine.BitsetEngine(*args)]
+	decoders = [evaluator.IncrementalDecoder(engine, evaluator.CHECKPOINT_BYTES, 2) for engine in engines]
+	n_genes = sum(grid_engine.job_genes)
+
+	problems = []
+	def mismatch(what, permutation):
+		problems.append('trial %d: %s for %s' % (trial, what, ''.join([str(x) for x in permutation])))
+
+	for k in range(n_chromosomes):
+		permutation = [rng.randint(0, len(jobs)-1) for x in range(n_genes)]
+		grid, skipped_tasks = grid_engine.generate_schedule(permutation, work_hours)
+		result = grid_engine.evaluate(permutation, work_hours)
+		fitness = result[0]
+
+		for engine, decoder in zip(engines, decoders):
+			name = type(engine).__name__
+			other_grid, other_skipped = engine.generate_schedule(permutation, work_hours)
+			if not same_grid(grid, other_grid) or skipped_tasks != other_skipped:
+				mismatch('%s schedule' % name, permutation)
+				continue
+			if engine.evaluate(permutation, work_hours) != result:
+				mismatch('%s score' % name, permutation)
+			if decoder.evaluate(permutation, work_hours) != result:
+				mismatch('%s score from checkpoints' % name, permutation)
+			if fitness == None:
+				continue
+			for cutoff in (fitness, fitness-1):
+				expected = grid_engine.evaluate(permutation, work_hours, cutoff)
+				if engine.evaluate(permutation, work_hours, cutoff) != expected:
+					mismatch('%s score with a cutoff of %d' % (name, cutoff), permutation)
+
+		if legacy and not skipped_tasks:
+			job_schedules, legacy_skipped = gs.generate_schedule(
+				initial_date, existing_jobs, jobs, permutation, workday_start, workday_end, 0,
+				work_hours=grid.shape[1] // 12)
+			if job_schedules != grid_engine.job_schedules(grid) or legacy_skipped:
+				mismatch('generate_schedule', permutation)
+
+	return problems
+
+def check_long(initial_date, n_chromosomes):
+	'''Decodes n_chromosomes chromosomes of 1200 genes with every engine, and runs a generation of the genetic
+	algorithm on them.
+	returns:
+	a list of what went wrong'''
+	jobs = benchmark.synthetic_jobs(3, 20, 20, flexible=1., seed=0)
+	existing_jobs = benchmark.synthetic_events(seed=0)
+	workday_start, workday_end = WORKDAYS[0]
+	work_hours = 48
+
+	args = (jobs, existing_jobs, initial_date, workday_start, workday_end)
+	grid_engine = schedule_engine.GridEngine(*args)
+	engines = [interval_engine.IntervalEngine(*args), bitset_engine.BitsetEngine(*args)]
+	rng = random.Random(0)
+
+	problems = []
+	for k in range(n_chromosomes):
+		permutation = [rng.randint(0, len(jobs)-1) for x in range(sum(grid_engine.job_genes))]
+		grid, skipped_tasks = grid_engine.generate_schedule(permutation, work_hours)
+		for engine in engines:
+			other_grid, other_skipped = engine.generate_schedule(permutation, work_hours)
+			if not same_grid(grid, other_grid) or skipped_tasks != other_skipped:
+				problems.append('long chromosome %d: %s schedule' % (k, type(engine).__name__))
+
+	# Only the debugging output counts the chromosomes, so that's turned on, but kept quiet
+	config = ga_config.GAConfig(max_generations=1)
+	try:
+		with contextlib.redirect_stdout(io.StringIO()):
+			best_individual, history = gs.optimise(*(args + (work_hours, 1, 0, 1, config)))
+	except Exception as e:
+		problems.append('long chromosomes: optimise raised %r' % e)
+	else:
+		if best_individual is None:
+			problems.append("long chromosomes: optimise didn't find a schedule")
+	return problems
+
+def main():
+	parser = argparse.ArgumentParser(description='Checks that all the engines decode chromosomes the same way.')
+	parser.add_argument('--trials', type=int, default=100, help='number of sets of jobs to try')
+	parser.add_argument('--chromosomes', type=int, default=15, help='chromosomes to decode for each set of jobs')
+	parser.add_argument('--legacy-trials', type=int, default=20,
+		help='number of sets of jobs to check against the original generate_schedule too')
+	parser.add_argument('--long-chromosomes', type=int, default=3,
+		help='chromosomes of over a thousand genes to decode at the end')
+	parser.add_argument('--seed', type=int, default=0)
+	args = parser.parse_args()
+
+	rng = random.Random(args.seed)
+	initial_date = datetime.datetime(2018, 9, 3).replace(tzinfo=pytz.timezone('Europe/London'))
+
+	problems = []
+	for trial in range(args.trials):
+		problems += check_trial(trial, rng, initial_date, args.chromosomes, trial < args.legacy_trials)
+	problems += check_long(initial_date, args.long_chromosomes)
+	for problem in problems:
+		print(problem)
+	print('%d mismatches in %d chromosomes' % (len(problems), args.trials*args.chromosomes))
+	return 1 if problems else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Checks exact_solver against brute force: for small enough sets of jobs, every chromosome there is gets scored, and
+the exact solver has to find the same best score, say it's optimal, and hand back a chromosome that really scores
+that.
+
+	python check_exact.py --trials 500
+
+The jobs come from benchmark.synthetic_jobs and check_engines.awkward_jobs, and are only tried if there are no
+more than --max-chromosomes chromosomes to score.
+
+Prints each mismatch, and exits with 1 if there were any.
+'''
+
+import argparse
+import datetime
+import itertools
+import random
+import sys
+
+import pytz
+
+import benchmark
+import check_engines
+import exact_solver
+import interval_engine
+
+def brute_force(engine, n_jobs, work_hours):
+	'''The best score of every chromosome there is, or None if they all skip tasks'''
+	best = None
+	for permutation in itertools.product(range(n_jobs), repeat=sum(engine.job_genes)):
+		fitness, skipped_tasks = engine.evaluate(permutation, work_hours)
+		if not skipped_tasks and (best == None or fitness < best):
+			best = fitness
+	return best
+
+def main():
+	parser = argparse.ArgumentParser(description='Checks the exact solver against trying every chromosome.')
+	parser.add_argument('--trials', type=int, default=200, help='number of sets of jobs to make')
+	parser.add_argument('--max-chromosomes', type=int, default=5000,
+		help='skip sets of jobs with more chromosomes than this')
+	parser.add_argument('--seed', type=int, default=0)
+	args = parser.parse_args()
+
+	rng = random.Random(args.seed)
+	initial_date = datetime.datetime(2018, 9, 3).replace(tzinfo=pytz.timezone('Europe/London'))
+	workday_start, workday_end = check_engines.WORKDAYS[0]
+
+	problems = []
+	n_checked = 0
+	for trial in range(args.trials):
+		if trial % 2:
+			jobs = check_engines.awkward_jobs(rng, rng.randint(1, 3))
+			existing_jobs = check_engines.awkward_events(rng, rng.randint(0, 20))
+		else:
+			jobs = benchmark.synthetic_jobs(rng.randint(1, 3), 2, 2, inactive=rng.random(), seed=trial)
+			existing_jobs = benchmark.synthetic_events(rng.random()*0.6, seed=trial)
+		work_hours = rng.choice([24, 48])
+
+		engine = interval_engine.IntervalEngine(jobs, existing_jobs, initial_date, workday_start, workday_end)
+		if len(jobs)**sum(engine.job_genes) > args.max_chromosomes:
+			continue
+		n_checked += 1
+
+		best = brute_force(engine, len(jobs), work_hours)
+		best_individual, history = exact_solver.solve(
+			jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours)
+		certificate = history['certificate']
+
+		if certificate['fitness'] != best:
+			problems.append('trial %d: exact found %s, but the best is %s' % (trial, certificate['fitness'], best))
+		elif best != None and not certificate['optimal']:
+			problems.append("trial %d: exact found %s, but didn't prove it" % (trial, best))
+		elif best_individual is not None and engine.evaluate(best_individual, work_hours)[0] != best:
+			problems.append("trial %d: exact's chromosome doesn't score %s" % (trial, best))
+
+	for problem in problems:
+		print(problem)
+	print('%d mismatches in %d sets of jobs' % (len(problems), n_checked))
+	return 1 if problems else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Runs the scheduler from the command line, without the GUI, e.g. on a server:
+
+	python cli.py job1.json job2.json --existing calendar.ics --start 2018-09-03 --output Schedules/
+
+Writes the schedule to an .ics file in the output directory, and prints its path. Nothing else is printed unless
+you ask for it with -v (or -vv for every chromosome in every generation). Exits with 1 if the jobs can't all be
+fitted in.
+
+Only the solver is imported, and only once the arguments have been read, so that this starts quickly.
+'''
+
+import argparse
+import datetime
+import sys
+
+def parse_date(text):
+	return datetime.datetime.strptime(text, '%Y-%m-%d')
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Finds a good schedule for some jobs, and writes it to an .ics file.')
+	parser.add_argument('jobs', nargs='+', help='job .json files, as written by JobGenerator')
+	parser.add_argument('--existing', help='.ics or .csv file of the events already in the calendar')
+	parser.add_argument('--start', type=parse_date, default=None,
+		help='the first day of the schedule, as YYYY-MM-DD (default: today)')
+	parser.add_argument('--output', default='./', help='directory to write the .ics file to (default: here)')
+	parser.add_argument('--population', type=int, default=20, help='individuals in each generation')
+	parser.add_argument('--elite', type=int, default=0,
+		help='how many of the best individuals go through to the next generation unchanged')
+	parser.add_argument('--mutation-rate', type=float, default=0.05, help='chance of each gene mutating')
+	parser.add_argument('--crossover-rate', type=float, default=1.0,
+		help='chance of a child having two parents, rather than being a copy of one')
+	parser.add_argument('--threshold', type=float, default=0.05,
+		help='stop once the spread of scores is below this fraction of the gap from the best to the lower bound')
+	parser.add_argument('--patience', type=int, default=5,
+		help='stop after this many generations without improving')
+	parser.add_argument('--max-generations', type=int, default=None, help='stop after this many generations')
+	parser.add_argument('--max-evaluations', type=int, default=None, help='stop after scoring this many chromosomes')
+	parser.add_argument('--time-limit', type=float, default=None, help='stop after this many seconds')
+	parser.add_argument('--workers', type=int, default=1,
+		help='processes to score chromosomes with (0 for one per core)')
+	parser.add_argument('--search', choices=('ga', 'islands', 'steady', 'anneal', 'tabu', 'dispatch', 'exact'),
+		default='ga',
+		help='ga: one population, a generation at a time. islands: several populations in their own processes, '
+		'swapping their best now and then. steady: breed a new child whenever a worker is free. '
+		'anneal/tabu: simulated annealing or tabu search from one chromosome. '
+		'dispatch: the best of a few simple rules, in well under a second. '
+		'exact: find the best schedule there is, for a few small jobs')
+	parser.add_argument('--islands', type=int, default=None,
+		help='how many islands to use with --search islands (default: one per core)')
+	parser.add_argument('--checkpoint-mb', type=float, default=0,
+		help='memory for each process to keep part-decoded chromosomes in, in MB (default: none)')
+	parser.add_argument('--no-seed-rules', action='store_true',
+		help="start from a purely random first generation, without the dispatch rules' chromosomes")
+	parser.add_argument('--seed', type=int, default=None, help='seed for the random numbers, to repeat a run')
+	parser.add_argument('--desktop', action='store_true', help='also copy the .ics file to ~/Desktop')
+	parser.add_argument('-v', '--verbose', action='count', default=0, help='print progress (-vv for more)')
+	args = parser.parse_args(argv)
+
+	import ga_config
+	import genetic_scheduler
+
+	try:
+		config = ga_config.GAConfig(
+			n_individuals=args.population,
+			n_elite=args.elite,
+			mutation_rate=args.mutation_rate,
+			crossover_rate=args.crossover_rate,
+			threshold=args.threshold,
+			patience=args.patience,
+			max_generations=args.max_generations,
+			max_evaluations=args.max_evaluations,
+			time_limit=args.time_limit,
+			seed_rules=not args.no_seed_rules,
+			checkpoint_bytes=int(args.checkpoint_mb * 1024**2),
+			)
+	except ValueError as error:
+		parser.error(str(error))
+
+	initial_date = args.start
+	if initial_date == None:
+		initial_date = datetime.datetime.combine(datetime.date.today(), datetime.datetime.min.time())
+
+	oname = genetic_scheduler.run_scheduler(
+		args.jobs, args.output, initial_date, args.existing,
+		n_workers=args.workers or None,
+		seed=args.seed,
+		debug=args.verbose,
+		copy_to_desktop=args.desktop,
+		config=config,
+		search=args.search,
+		n_islands=args.islands,
+		)
+
+	if oname == None:
+		sys.stderr.write("Couldn't fit all of the jobs into a schedule.\n")
+		return 1
+
+	print(oname)
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Dispatch rules: quick ways to make a good chromosome without searching at all.
+
+Each rule gives every task a priority, and the chromosome is built a gene at a time by picking the unfinished job
+whose next task has the highest priority (the first job on a tie). The rules are:
+
+longest_remaining   - the job with the most time left to go
+longest_experiment  - the job whose current experiment is longest. This is what the very first version of the
+                      scheduler did (see version 0 in scheduler.py).
+most_active         - the job with the most active time left, as that's what has to be fitted around everything
+fewest_tasks        - the job with the fewest tasks left, to get jobs finished off
+
+run_dispatch scores a chromosome from each rule and keeps the best, which takes well under a second. The same
+chromosomes are also put into the first generation of the genetic algorithms (see GAConfig.seed_rules), so they
+start from somewhere sensible rather than from nothing but random noise.
+'''
+
+import time
+
+import numpy as np
+
+import interval_engine
+import job_table
+from job_table import NONE
+
+def remaining(table, values):
+	'''Adds up values (one per task) over each task and the ones after it in the same job'''
+	totals = [0] * table.n_tasks
+	job = table.job.tolist()
+	for code in reversed(range(table.n_tasks)):
+		totals[code] = values[code]
+		if code+1 < table.n_tasks and job[code+1] == job[code]:
+			totals[code] += totals[code+1]
+	return totals
+
+def longest_remaining(table):
+	return remaining(table, table.time.tolist())
+
+def longest_experiment(table):
+	time = table.time.tolist()
+	return [sum(time[first:first+length])
+		for first, length in zip(table.exp_first.tolist(), table.exp_length.tolist())]
+
+def most_active(table):
+	return remaining(table, (table.time * table.active[:table.n_tasks]).tolist())
+
+def fewest_tasks(table):
+	return [-n for n in remaining(table, [1] * table.n_tasks)]
+
+RULES = {
+	'longest_remaining': longest_remaining,
+	'longest_experiment': longest_experiment,
+	'most_active': most_active,
+	'fewest_tasks': fewest_tasks,
+	}
+
+def dispatch(engine, priority):
+	'''Builds the chromosome that always picks the unfinished job whose next task has the highest priority'''
+	advance = [footprint.next_task for footprint in engine.footprints]
+	current_tasks = engine.table.job_first.tolist()
+
+	genes = []
+	while current_tasks.count(NONE) != len(current_tasks):
+		best = None
+		for job_index, code in enumerate(current_tasks):
+			if code != NONE and (best == None or priority[code] > priority[current_tasks[best]]):
+				best = job_index
+		genes.append(best)
+		current_tasks[best] = advance[current_tasks[best]]
+
+	# Pad it out to a full chromosome. The extra genes never get used.
+	chromosome = np.zeros(max(engine.table.n_genes, len(genes)), dtype=job_table.gene_dtype(engine.n_jobs))
+	chromosome[:len(genes)] = genes
+	return chromosome
+
+def rule_chromosomes(engine, rules=None):
+	'''The chromosome from each of rules (all of them if None), by name'''
+	if rules == None:
+		rules = list(RULES)
+	return dict((rule, dispatch(engine, RULES[rule](engine.table))) for rule in rules)
+
+def seed_cohort(cohort, engine, rules=None):
+	'''Swaps the first individuals in cohort for the chromosomes from the rules, leaving out any repeats'''
+	seeds = []
+	for chromosome in rule_chromosomes(engine, rules).values():
+		if len(chromosome) == cohort.shape[1] and not any(np.array_equal(chromosome, seed) for seed in seeds):
+			seeds.append(chromosome)
+	seeds = seeds[:len(cohort)]
+	if seeds:
+		cohort[:len(seeds)] = seeds
+	return cohort
+
+def run_dispatch(jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours=2*24, debug=0,
+	rules=None):
+	'''Scores the chromosome from each of rules (all of them if None), and keeps the best.
+	returns:
+	best_individual, history
+	just like optimise. history['rules'] has the fitness from each rule, or None if it had to skip tasks.'''
+	engine = interval_engine.IntervalEngine(jobs, existing_jobs, initial_date, workday_start, workday_end)
+
+	t_start = time.time()
+	history = {'best_scores': [], 'evaluations': 0, 'generations': 0, 'rules': {}}
+	best_score, best_individual = None, None
+	for rule, chromosome in rule_chromosomes(engine, rules).items():
+		fitness, skipped_tasks = engine.evaluate(chromosome, work_hours)
+		history['evaluations'] += 1
+		if skipped_tasks:
+			fitness = None
+		history['rules'][rule] = fitness
+		if debug:
+			print('%-20s - %s' % (rule, fitness))
+		if fitness != None and (best_score == None or fitness < best_score):
+			best_score, best_individual = fitness, chromosome
+			history['best_scores'].append(fitness)
+
+	seconds = time.time() - t_start
+	history['seconds'] = seconds
+	history['evaluations_per_second'] = history['evaluations'] / seconds if seconds else 0.
+
+	if debug:
+		if best_individual is None:
+			print("I couldn't find a solution to this set of jobs.")
+		else:
+			print('The best individual was %s' % ''.join([str(x) for x in best_individual]))
+
+	return best_individual, history
@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Evaluators score a whole cohort of chromosomes at once, so the genetic algorithm doesn't need to care whether that
+happens one after another or spread across several processes.
+
+Both kinds have the same interface:
+
+	evaluator.evaluate(cohort, work_hours) -> [(fitness, skipped_tasks), ...]   in the same order as cohort
+	evaluator.close()
+
+evaluate can also take a cutoff, so chromosomes that can't score that well or better are given up on part way,
+and get a fitness of None (see GridEngine.decode).
+
+Either can be wrapped in a CachedEvaluator, so that chromosomes that have been seen before aren't decoded again.
+Each process can also keep checkpoints part of the way through the chromosomes it decodes (IncrementalDecoder), so
+that a child which shares the start of its genes with an earlier chromosome only has to decode the rest. With the
+IntervalEngine a decode is cheap enough that restoring and storing checkpoints costs about as much as it saves, so
+they're off unless asked for, with GAConfig's checkpoint_bytes (--checkpoint-mb on the command line).
+
+Decoding a chromosome is deterministic, so the results don't depend on how many workers there are or which one
+gets which chromosome.
+'''
+
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import interval_engine
+import schedule_engine
+
+# Default memory budget for remembered fitnesses, in bytes
+CACHE_BYTES = 64 * 1024**2
+
+# Rough cost of storing one entry in the cache, on top of the key itself: the dict slot, the tuple key, the
+# result tuple and its list of skipped tasks.
+ENTRY_OVERHEAD = 300
+
+# Default memory budget for decoder checkpoints, per process, in bytes
+CHECKPOINT_BYTES = 128 * 1024**2
+
+# Most checkpoints to keep, per process, however small they are
+MAX_CHECKPOINTS = 4096
+
+# How many checkpoints to aim for along each chromosome
+CHECKPOINTS_PER_DECODE = 8
+
+class CheckpointStore(object):
+	'''Keeps the checkpoints from recently decoded chromosomes, up to roughly max_bytes and max_entries of them,
+	and finds the deepest one that a new chromosome can restart from.
+
+	Checkpoints are only ever taken every checkpoint_every genes, and a checkpoint only depends on the genes
+	before it, so each one is filed under those genes. Finding one is then just a dict lookup at each of those
+	points along the chromosome, deepest first.'''
+
+	def __init__(self, checkpoint_every, max_bytes=CHECKPOINT_BYTES, max_entries=MAX_CHECKPOINTS):
+		self.checkpoint_every = checkpoint_every
+		self.max_bytes   = max_bytes
+		self.max_entries = max_entries
+		self.n_bytes = 0
+		self.entries = OrderedDict()
+
+	def key(self, genes, work_hours, perm_index):
+		return work_hours, genes[:perm_index].tobytes()
+
+	def find(self, permutation, work_hours):
+		'''Returns the deepest checkpoint whose genes match the start of permutation, or None if there isn't one'''
+		genes = np.asarray(permutation, dtype=np.int32)
+		every = self.checkpoint_every
+		for perm_index in range(len(genes) - len(genes) % every, 0, -every):
+			key = self.key(genes, work_hours, perm_index)
+			checkpoint = self.entries.get(key)
+			if checkpoint != None:
+				# This one's been useful, so keep it around for longer
+				self.entries.move_to_end(key)
+				return checkpoint
+		return None
+
+	def add(self, permutation, work_hours, checkpoints):
+		genes = np.asarray(permutation, dtype=np.int32)
+		for checkpoint in checkpoints:
+			key = self.key(genes, work_hours, checkpoint.perm_index)
+			if key in self.entries:
+				continue
+			self.entries[key] = checkpoint
+			self.n_bytes += checkpoint.nbytes
+
+		while self.n_bytes > self.max_bytes or len(self.entries) > self.max_entries:
+			old_key, old_checkpoint = self.entries.popitem(last=False)
+			self.n_bytes -= old_checkpoint.nbytes
+
+class IncrementalDecoder(object):
+	'''Scores chromosomes like GridEngine.evaluate, but restarts each one from the deepest checkpoint it shares
+	with a chromosome decoded earlier, and leaves checkpoints of its own for later chromosomes.'''
+
+	def __init__(self, engine, max_bytes=CHECKPOINT_BYTES, checkpoint_every=None):
+		self.engine = engine
+		if checkpoint_every == None:
+			checkpoint_every = max(1, sum(engine.job_genes) // CHECKPOINTS_PER_DECODE)
+		self.checkpoint_every = checkpoint_every
+		self.store = CheckpointStore(checkpoint_every, max_bytes)
+
+		# How many genes were decoded, and how many were skipped by starting from a checkpoint
+		self.genes_decoded = 0
+		self.genes_reused  = 0
+
+	def evaluate(self, permutation, work_hours, cutoff=None):
+		checkpoint = self.store.find(permutation, work_hours)
+		grid, skipped_tasks, checkpoints, end = self.engine.decode(
+			permutation, work_hours, checkpoint, self.checkpoint_every, cutoff)
+		# The checkpoints from a decode that was given up on are still good, and let it pick up from near where it
+		# stopped if it has to be decoded in full later
+		self.store.add(permutation, work_hours, checkpoints)
+
+		reused = 0 if checkpoint == None else checkpoint.perm_index
+		self.genes_reused  += reused
+		self.genes_decoded += sum(self.engine.job_genes) - reused
+
+		if grid is None:
+			return None, skipped_tasks
+		return end, skipped_tasks
+
+def make_decoder(jobs, existing_jobs, initial_date, workday_start, workday_end, checkpoint_bytes):
+	'''Sets up what each process scores chromosomes with: the engine itself, or a checkpointing decoder around it.
+	The engine is an IntervalEngine, which gives exactly the same scores as a GridEngine, only quicker.'''
+	engine = interval_engine.IntervalEngine(jobs, existing_jobs, initial_date, workday_start, workday_end)
+	if checkpoint_bytes:
+		return IncrementalDecoder(engine, checkpoint_bytes)
+	return engine
+
+class SerialEvaluator(object):
+	'''Scores chromosomes one at a time, in this process'''
+
+	def __init__(self, jobs, existing_jobs, initial_date, workday_start, workday_end, checkpoint_bytes=0):
+		self.decoder = make_decoder(jobs, existing_jobs, initial_date, workday_start, workday_end, checkpoint_bytes)
+
+	def evaluate(self, cohort, work_hours, cutoff=None):
+		return [self.decoder.evaluate(permutation, work_hours, cutoff) for permutation in cohort]
+
+	def close(self):
+		pass
+
+# Each worker process builds its own decoder when it starts, and keeps it here. Its checkpoints stay in the
+# worker too, so they only help with chromosomes that end up in the same worker.
+_worker_decoder = None
+
+def _init_worker(jobs, existing_jobs, initial_date, workday_start, workday_end, checkpoint_bytes):
+	global _worker_decoder
+	_worker_decoder = make_decoder(jobs, existing_jobs, initial_date, workday_start, workday_end, checkpoint_bytes)
+
+def _evaluate_in_worker(chromosomes, work_hours, cutoff):
+	return [_worker_decoder.evaluate(permutation, work_hours, cutoff) for permutation in chromosomes]
+
+def _evaluate_one_in_worker(permutation, work_hours, cutoff):
+	return _worker_decoder.evaluate(permutation, work_hours, cutoff)
+
+class PoolEvaluator(object):
+	'''Fans a cohort out over a pool of worker processes.
+
+	The jobs, existing events and calendar settings are sent to each worker once, when the pool starts, so only
+	the chromosomes and their scores go back and forth for each generation. The chromosomes go as a few 2D
+	arrays of genes, rather than one list of ints each.'''
+
+	def __init__(self, jobs, existing_jobs, initial_date, workday_start, workday_end, n_workers=None,
+		checkpoint_bytes=0):
+		if n_workers == None:
+			n_workers = os.cpu_count()
+		self.n_workers = n_workers
+
+		self.pool = ProcessPoolExecutor(
+			max_workers=n_workers,
+			initializer=_init_worker,
+			initargs=(jobs, existing_jobs, initial_date, workday_start, workday_end, checkpoint_bytes)
+			)
+
+	def evaluate(self, cohort, work_hours, cutoff=None):
+		if not len(cohort):
+			return []
+
+		# Send a few chromosomes at a time, but make sure every worker gets some
+		n_chunks = min(len(cohort), 4*self.n_workers)
+		chunks = np.array_split(np.asarray(cohort), n_chunks)
+		work_hours = [work_hours] * n_chunks
+		cutoffs = [cutoff] * n_chunks
+
+		results = []
+		for chunk_results in self.pool.map(_evaluate_in_worker, chunks, work_hours, cutoffs):
+			results += chunk_results
+		return results
+
+	def submit(self, permutation, work_hours, cutoff=None):
+		'''Starts scoring one chromosome, without waiting for it.
+		returns:
+		A Future, whose result is (fitness, skipped_tasks)'''
+		return self.pool.submit(_evaluate_one_in_worker, np.asarray(permutation), work_hours, cutoff)
+
+	def close(self):
+		self.pool.shutdown()
+
+class FitnessCache(object):
+	'''Least-recently-used store of fitness results, limited to roughly max_bytes of memory'''
+
+	def __init__(self, max_bytes=CACHE_BYTES):
+		self.max_bytes = max_bytes
+		self.n_bytes   = 0
+		self.entries   = OrderedDict()
+
+		self.hits   = 0
+		self.misses = 0
+
+	def __len__(self):
+		return len(self.entries)
+
+	def get(self, key):
+		'''Returns the stored result for key, or None'''
+		result = self.entries.get(key)
+		if result == None:
+			self.misses += 1
+			return None
+		self.hits += 1
+		self.entries.move_to_end(key)
+		return result
+
+	def put(self, key, result):
+		if key in self.entries:
+			return
+		self.entries[key] = result
+		self.n_bytes += self._size(key)
+
+		# Forget the least recently used results until we're back under budget
+		while self.n_bytes > self.max_bytes and self.entries:
+			old_key, old_result = self.entries.popitem(last=False)
+			self.n_bytes -= self._size(old_key)
+
+	def _size(self, key):
+		return len(key[1]) + ENTRY_OVERHEAD
+
+	def hit_rate(self):
+		lookups = self.hits + self.misses
+		if not lookups:
+			return 0.
+		return float(self.hits) / lookups
+
+class CachedEvaluator(object):
+	'''Remembers the fitness of every chromosome it scores, and only passes new ones on to the evaluator it wraps.
+
+	Chromosomes are looked up by their canonical form (see GridEngine.canonical), so genes that are never used,
+	or that get redirected to another job, don't stop two chromosomes from matching. Chromosomes that were given up
+	on for being worse than the cutoff aren't remembered, as we don't know their real score.'''
+
+	def __init__(self, evaluator, canonical, max_bytes=CACHE_BYTES):
+		self.evaluator = evaluator
+		self.canonical = canonical
+		self.cache = FitnessCache(max_bytes)
+
+	def evaluate(self, cohort, work_hours, cutoff=None):
+		results = [None] * len(cohort)
+
+		# Gather up the chromosomes we haven't seen. Repeats within the cohort only get scored once.
+		unseen = OrderedDict()
+		for x, permutation in enumerate(cohort):
+			key = (work_hours, self.canonical(permutation))
+			result = self.cache.get(key)
+			if result != None:
+				results[x] = result
+			elif key in unseen:
+				unseen[key].append(x)
+			else:
+				unseen[key] = [x]
+
+		if unseen:
+			todo = np.asarray([cohort[positions[0]] for positions in unseen.values()])
+			for (key, positions), result in zip(unseen.items(), self.evaluator.evaluate(todo, work_hours, cutoff)):
+				if result[0] != None:
+					self.cache.put(key, result)
+				for x in positions:
+					results[x] = result
+
+		return results
+
+	def close(self):
+		self.evaluator.close()
+
+def make_evaluator(jobs, existing_jobs, initial_date, workday_start, workday_end, n_workers=1,
+	cache_bytes=CACHE_BYTES, checkpoint_bytes=0):
+	'''Gets the right evaluator for the number of workers asked for. 1 keeps everything in this process,
+	None uses every core. Results are cached, unless cache_bytes is 0, and each process keeps up to
+	checkpoint_bytes of checkpoints (e.g. CHECKPOINT_BYTES) if it's set.'''
+	if n_workers == 1:
+		evaluator = SerialEvaluator(jobs, existing_jobs, initial_date, workday_start, workday_end, checkpoint_bytes)
+	else:
+		evaluator = PoolEvaluator(
+			jobs, existing_jobs, initial_date, workday_start, workday_end, n_workers, checkpoint_bytes)
+	engine = schedule_engine.GridEngine(jobs, existing_jobs, initial_date, workday_start, workday_end)
+
+	if cache_bytes:
+		evaluator = CachedEvaluator(evaluator, engine.canonical, cache_bytes)
+
+	return evaluator
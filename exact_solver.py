@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+An exact search for small sets of jobs, which finds the best chromosome there is and proves it.
+
+Rather than trying every permutation, this searches over the decoder's decisions. At each step the only choice
+that matters is which of the unfinished jobs places its next task (a gene pointing at a finished job just gets
+passed on to another one), so the search is a tree with one branch for each unfinished job, and each path through
+it is a canonical chromosome (see GridEngine.canonical). Lots of different paths lead to exactly the same
+schedule so far, e.g. when two jobs' tasks go in far apart, and whatever happens next only depends on that, so each
+state is only searched once. States are remembered by a digest of the grid, the next task of each job and the end of
+the schedule.
+
+Each branch is bounded the same way as the cutoff in GridEngine.decode: every job still has to finish, which can
+be no earlier than the end of its last task plus the rest of its tasks end to end. Any branch that can't beat the
+best schedule found so far is dropped, and the branches that look most promising are tried first. The search
+also stops as soon as it finds a schedule that reaches the lower bound from bounds.py.
+
+A state with less in it can't be said to beat one with more in it, as the decoder puts each task in the first
+place it fits, and leaving a gap can push a later task further back. So the only states that get pruned are
+exact repeats, and ones that can't beat the best so far.
+'''
+
+import hashlib
+
+import numpy as np
+
+import bounds
+import ga_config
+import job_table
+import schedule_engine
+from job_table import NONE
+
+def state_key(checkpoint):
+	'''A digest of everything that decides how a state carries on'''
+	digest = hashlib.blake2b(digest_size=16)
+	digest.update(np.array(checkpoint.current_tasks + (checkpoint.end,), dtype=np.int64).tobytes())
+	digest.update(checkpoint.grid.tobytes())
+	return digest.digest()
+
+def solve(jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours=2*24, debug=0, config=None):
+	'''Searches every canonical chromosome for the best schedule, skipping repeated states and branches that can't
+	beat the best found so far. The time_limit and max_evaluations in config (each state decoded counts as an
+	evaluation) stop the search early, in which case the best so far isn't proven to be the best.
+	returns:
+	best_individual, history
+	just like optimise. history['certificate'] says how the answer was proven: its fitness, the lower bound it was
+	compared against, and how many states were searched, remembered and pruned. certificate['optimal'] is True if
+	nothing can do better.'''
+	if config == None:
+		config = ga_config.GAConfig()
+
+	engine = schedule_engine.GridEngine(jobs, existing_jobs, initial_date, workday_start, workday_end)
+	n_jobs  = len(jobs)
+	n_tasks = job_table.count_genes(jobs)
+
+	best_scores = []
+	history = {'best_scores': best_scores, 'evaluations': 0}
+	progress = bounds.SearchProgress(jobs, existing_jobs, initial_date, workday_start, workday_end, history)
+	bound = progress.bound
+	best_score, best_genes = None, None
+	seen = set()
+	n_pruned = 0
+
+	if debug:
+		print('Searching %s permutations exactly, with a lower bound of %d' % (
+			job_table.count_chromosomes(n_jobs, n_tasks), bound))
+
+	def node_bound(checkpoint):
+		'''The least the makespan can come to from here'''
+		return max([checkpoint.end] + [engine.earliest_end(start, code)
+			for start, code in zip(checkpoint.frontier, checkpoint.current_tasks) if code != NONE])
+
+	def children(genes, checkpoint):
+		'''Every state one more task on from checkpoint, most promising first'''
+		found = []
+		for job_index, code in enumerate(checkpoint.current_tasks):
+			if code == NONE:
+				continue
+			grid, skipped_tasks, checkpoints, end = engine.decode(
+				genes + [job_index], work_hours, checkpoint, n_genes=len(genes)+1)
+			history['evaluations'] += 1
+			child = checkpoints[-1]
+			# Anything that skips a task will never fit at all
+			if not child.skipped_tasks:
+				found.append((node_bound(child), job_index, child))
+		found.sort(key=lambda item: item[:2])
+		return [(genes + [job_index], child, child_bound) for child_bound, job_index, child in found]
+
+	grid, skipped_tasks, checkpoints, end = engine.decode([], work_hours, n_genes=0)
+	root = checkpoints[-1]
+
+	reason = None
+	stack = [([], root, node_bound(root))]
+	while stack:
+		genes, checkpoint, lower = stack.pop()
+		if best_score != None and lower >= best_score:
+			n_pruned += 1
+			continue
+
+		key = state_key(checkpoint)
+		if key in seen:
+			n_pruned += 1
+			continue
+		seen.add(key)
+
+		if checkpoint.current_tasks.count(NONE) == n_jobs:
+			fitness = checkpoint.end
+			if best_score == None or fitness < best_score:
+				best_score, best_genes = fitness, genes
+				best_scores.append(fitness)
+				if debug:
+					print('      %4d - after %d states, %.1lfs' % (fitness, len(seen), progress.seconds()))
+		else:
+			# The best go on the top of the stack
+			stack.extend(reversed(children(genes, checkpoint)))
+
+		reason = progress.stop_reason(config, 0, 0, float('inf'), best_score)
+		if reason != None:
+			break
+
+	optimal = best_score != None and (not stack or best_score <= bound)
+	history['generations'] = 0
+	seconds = progress.finish()
+	history['certificate'] = {
+		'fitness': best_score,
+		'chromosome': best_genes,
+		'bound': bound,
+		'optimal': optimal,
+		'states': len(seen),
+		'pruned': n_pruned,
+		}
+
+	if debug:
+		if reason != None:
+			print(reason)
+		print('Searched %d states and pruned %d, in %.1lfs' % (len(seen), n_pruned, seconds))
+
+	if best_genes == None:
+		if debug:
+			print("I couldn't find a solution to this set of jobs.")
+		return None, history
+
+	if debug:
+		if optimal:
+			print('Nothing can beat %d, so this is the best schedule there is' % best_score)
+		else:
+			print('Stopped before proving %d is the best' % best_score)
+
+	# Pad it out to a full chromosome. The extra genes never get used.
+	best_individual = np.zeros(max(n_tasks, len(best_genes)), dtype=job_table.gene_dtype(n_jobs))
+	best_individual[:len(best_genes)] = best_genes
+	if debug:
+		print('The best individual was %s' % ''.join([str(x) for x in best_individual]))
+	return best_individual, history
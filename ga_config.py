@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Settings for the genetic algorithm: how big each generation is, how it breeds, and when to stop.
+
+The defaults are the values run_scheduler has always used, so GAConfig() behaves just like the original, except
+that the first generation starts with a chromosome from each of the dispatch rules, and that the spread of the
+scores is measured against the gap to the lower bound, with a threshold of 5% rather than 10% of the best score.
+Makespans only differ by a few percent, so the old rule stopped every run after the first generation. For big
+sets of jobs, something like
+
+	GAConfig(n_individuals=2000, n_elite=20, time_limit=600)
+
+keeps a much larger population, carries the best few over unchanged, and gives up after ten minutes.
+'''
+
+class GAConfig(object):
+	'''n_individuals    - size of each generation
+	n_elite          - how many of the best individuals are carried over to the next generation unchanged
+	mutation_rate    - chance of each gene in a child being replaced with a random one
+	crossover_rate   - chance of a child being bred from two parents, rather than being a copy of its mother
+	threshold        - stop once the standard deviation of the scores falls below this fraction of the gap
+	                   between the best score and the lower bound (see bounds.spread)
+	patience         - stop after this many generations without a new best score
+	max_generations  - stop after this many generations (None for no limit)
+	max_evaluations  - stop after scoring this many chromosomes (None for no limit)
+	time_limit       - stop after this many seconds (None for no limit)
+	seed_rules       - put the chromosomes from the dispatch rules in the first generation (see dispatch_rules.py)
+	checkpoint_bytes - memory for each process to keep checkpoints part way through the chromosomes it decodes,
+	                   so children only decode the genes they don't share with an earlier chromosome (0 for none,
+	                   which is usually quicker, see evaluator.IncrementalDecoder)
+	'''
+
+	def __init__(self, n_individuals=20, n_elite=0, mutation_rate=0.05, crossover_rate=1.0, threshold=0.05,
+		patience=5, max_generations=None, max_evaluations=None, time_limit=None, seed_rules=True, checkpoint_bytes=0):
+		if n_individuals < 2:
+			raise ValueError('A generation needs at least 2 individuals, not %d' % n_individuals)
+		if not 0 <= n_elite <= n_individuals//2:
+			raise ValueError('n_elite must be between 0 and half of n_individuals, not %d' % n_elite)
+		for name, rate in (('mutation_rate', mutation_rate), ('crossover_rate', crossover_rate)):
+			if not 0. <= rate <= 1.:
+				raise ValueError('%s must be between 0 and 1, not %r' % (name, rate))
+		if checkpoint_bytes < 0:
+			raise ValueError("checkpoint_bytes can't be negative, not %r" % checkpoint_bytes)
+
+		self.n_individuals   = n_individuals
+		self.n_elite         = n_elite
+		self.mutation_rate   = mutation_rate
+		self.crossover_rate  = crossover_rate
+		self.threshold       = threshold
+		self.patience        = patience
+		self.max_generations = max_generations
+		self.max_evaluations = max_evaluations
+		self.time_limit      = time_limit
+		self.seed_rules      = seed_rules
+		self.checkpoint_bytes = checkpoint_bytes
+
+	def __repr__(self):
+		return 'GAConfig(%s)' % ', '.join('%s=%r' % item for item in sorted(vars(self).items()))
+
+	def stop_reason(self, generation, stale, spread, evaluations, seconds, best=None, bound=None):
+		'''Checks the stopping rules, after generation generations, of which the last stale didn't improve on the
+		best score. spread is the standard deviation of the scores as a fraction of the gap between the best score
+		and the lower bound (see bounds.spread). There's no point carrying on once best gets down to the lower
+		bound.
+		returns:
+		Why to stop, or None to carry on'''
+		if bound != None and best != None and best <= bound:
+			return 'Reached the lower bound of %d, so this is as good as it gets' % bound
+		if stale >= self.patience:
+			return 'No improvement for %d generations' % stale
+		if spread < self.threshold:
+			return 'Threshold reached!'
+		if self.max_generations != None and generation >= self.max_generations:
+			return 'Reached %d generations' % generation
+		if self.max_evaluations != None and evaluations >= self.max_evaluations:
+			return 'Scored %d chromosomes' % evaluations
+		if self.time_limit != None and seconds >= self.time_limit:
+			return 'Ran out of time after %.0fs' % seconds
+		return None
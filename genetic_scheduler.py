@@ -9,14 +9,13 @@ To do this, it takes a preferred order of which jobs to do in the form of a chro
 [0,1,2,0,1,2,0,1,2]
 will place the next task from job 0 first, then from job 1, and so on.
 
-The ideal order is found using a genetic algorithm, with the fitness of an individual being the number of slots it
-requires to fit all the tasks in.
+The ideal order is found using a genetic algorithm, with the fitness of an individual being the makespan of its
+schedule: the slot after the last task ends.
 '''
 
 import numpy as np
 import json
 import time
-import random as rand
 import datetime
 import os
 from icalendar import Calendar, Event
@@ -24,17 +23,13 @@ import pytz
 import socket
 from shutil import copyfile
 
-def get_5_min_time(hh, mm=0):
-	'''takes hours and minutes, and converts it to the proper index for the schedule. Rounds mm DOWN to the nearest 5'''
-	# an hour in minutes
-	hh = int(float(hh)*60)
-
-	mm = int(mm)
-
-	# Make sure it's an int, so it rounds down to the nearest slot
-	t = int(hh+mm)/5
-	t = int(t)
-	return t
+import bounds
+import dispatch_rules
+import evaluator
+import ga_config
+import job_table
+import schedule_engine
+from job_table import get_5_min_time
 
 def read_job_file(fname):
 	'''Read in a job JSON file, and scrub the input so we dont have to worry about it later'''
@@ -483,75 +478,64 @@ def generate_schedule(
 
 	return job_schedules, skipped_tasks
 
-def breed(n_jobs, mutation_rate, threshold, n_individuals, n_tasks, cohort, cohort_results, debug=0):
-	'''Takes a set of individuals, and breeds them according to their fitness.'''
+def breed(n_jobs, config, cohort, rng, debug=0):
+	'''Takes a cohort, sorted best first, and breeds the next one from it, using the rates in config (a GAConfig).
+	The cohort is a 2D array with one individual per row, and all the random numbers are drawn at once from rng, a
+	numpy Generator, so this takes about the same time for thousands of individuals as for a handful.'''
 
 	if n_jobs == 1:
 		return cohort
 
-	# Take the top 50% of individuals, and breed them randomly to generate the next cohort
-	new_cohort = []
-	i = False
-	j = 0
-	mum = cohort[j]
-
-	for j in range(len(cohort)//2):
-		new_individual = []
-
-		# Mother cycles down the list, moving on after 2 offspring
-		if i:
-			mum = cohort[j]
-		i = not i
-
-		# Dad is a random father from the upper 50%
-		dad = rand.randint(0, int(len(cohort)/2))
-		dad = cohort[dad]
-		# ensure they're different
-		# while dad == mum:
-		# 	dad = rand.randint(0, len(cohort))
-		# 	dad = cohort[dad]
-
-		y = 0
-		which_parent = 0
-		while len(new_individual) < n_tasks:
-			# Choose a random integer between a fifth and a third of a chromosome to swap genes for
-			n_swap = rand.randint(0,n_tasks)
-			# Check we have enough genes left to do this
-			if y + n_swap >= n_tasks:
-				n_swap = n_tasks - y
-
-			# print('New chromosome is now %s' % ''.join( [str(c) for c in new_individual] ))
-
-			which_parent = (not which_parent)
-			if which_parent:
-				new_individual[y:y+n_swap] = mum[y:y+n_swap]
-			else:
-				new_individual[y:y+n_swap] = dad[y:y+n_swap]
+	n_individuals, n_tasks = cohort.shape
 
-			y += n_swap
+	# The best few go through unchanged
+	elites = cohort[:config.n_elite]
 
-		# mutate the individual
-		for i, val in enumerate(new_individual):
-			if rand.random() < mutation_rate:
-				# print('Mutation! Changing value %s' % new_individual[i])
-				new_individual[i] = rand.randint(0, n_jobs-1)
-				# print('to %s' % new_individual[i])
+	# Take the top 50% of individuals, and breed them randomly to generate the next cohort.
+	# Mother cycles down the list, moving on after 2 offspring, just as it always has. That skips every other one
+	# after the first: 0, 1, 1, 3, 3, 5, ... Dad is a random father from the upper 50%
+	n_children = n_individuals//2
+	mums = cohort[np.maximum((np.arange(n_children) - 1) | 1, 0)]
+	dads = cohort[rng.integers(0, n_children, n_children, endpoint=True)]
+	children = crossover(n_jobs, config, mums, dads, rng)
 
-		if debug > 2:
+	if debug > 2:
+		for mum, dad, child in zip(mums, dads, children):
 			print('breeding %s and %s' % (''.join([str(c) for c in mum]), ''.join([str(c) for c in dad])))
-			print('%s was born' % ''.join([str(c) for c in new_individual]))
-			print(len(new_individual))
+			print('%s was born' % ''.join([str(c) for c in child]))
+
+	# Randomly generate new offspring a la abiogenesis
+	immigrants = rng.integers(0, n_jobs, (n_individuals-len(elites)-n_children, n_tasks))
 
-		new_cohort.append(new_individual)
+	return np.vstack([elites, children, immigrants]).astype(cohort.dtype)
 
-	while len(new_cohort) < len(cohort):
-		# Randomly generate new offspring a la abiogenesis
-		new_individual = []
-		for j in range(n_tasks):
-			new_individual.append(rand.randint(0, n_jobs-1))
-		new_cohort.append(new_individual)
+def crossover(n_jobs, config, mums, dads, rng):
+	'''Breeds one child from each row of mums with the same row of dads, and mutates them'''
+	n_children, n_tasks = mums.shape
 
-	return new_cohort
+	# Children take alternate chunks of genes from each parent, starting with mum. Each chunk is a random length
+	# between 0 and n_tasks, so draw chunks until every child has enough of them.
+	chunks = rng.integers(0, n_tasks, (n_children, 4), endpoint=True)
+	while n_children and chunks.sum(axis=1).min() < n_tasks:
+		chunks = np.hstack([chunks, rng.integers(0, n_tasks, chunks.shape, endpoint=True)])
+
+	# Mark where each chunk ends. The parent to copy from swaps at every mark, so it's dad's gene wherever an
+	# odd number of chunks have ended, counting a zero length chunk as two.
+	cuts = np.minimum(np.cumsum(chunks, axis=1), n_tasks)
+	swaps = np.zeros((n_children, n_tasks+1), dtype=np.uint8)
+	np.add.at(swaps, (np.arange(n_children)[:, None], cuts), 1)
+	from_dad = np.bitwise_xor.accumulate(swaps[:, :n_tasks], axis=1) & 1
+
+	# Some children are just copies of their mum
+	if config.crossover_rate < 1.:
+		from_dad[rng.random(n_children) >= config.crossover_rate] = 0
+	children = np.where(from_dad, dads, mums)
+
+	# mutate the children
+	mutants = rng.random(children.shape) < config.mutation_rate
+	children[mutants] = rng.integers(0, n_jobs, np.count_nonzero(mutants))
+
+	return children
 
 def print_schedule(initial_date, existing_jobs, workday_start, workday_end, jobs, individual, work_hours):
 	# Get the schedule from the chromosome
@@ -660,7 +644,7 @@ def print_schedule(initial_date, existing_jobs, workday_start, workday_end, jobs
 
 	return
 
-def parse_ical_event(event, initial_date):
+def parse_ical_event(event, initial_date, debug=1):
 	# Get the name
 	name = str(event['SUMMARY'])+' --- '+str(event['DESCRIPTION'])
 
@@ -673,10 +657,12 @@ def parse_ical_event(event, initial_date):
 	now = datetime.datetime.now()
 	localtime = localtime.localize(now)
 	if bool(localtime.dst()):
-		print('We are currently in daylight savings time.')
-		print(start.strftime('%H:%M'))
+		if debug:
+			print('We are currently in daylight savings time.')
+			print(start.strftime('%H:%M'))
 		start = start + datetime.timedelta(hours=1)
-		print(start.strftime('%H:%M'))
+		if debug:
+			print(start.strftime('%H:%M'))
 		end   = end   + datetime.timedelta(hours=1)
 
 	interval_time = end - start
@@ -740,49 +726,13 @@ def parse_csv_event(line, initial_date):
 		}
 	return task
 
-def run_scheduler(fnames, destination='./', initial_date=None, existing_tasks=None):
-	# Print out debugging info?
-	debug = 10
-
-	# print(datetime.datetime.strftime(initial_date, '%m/%d/%Y %H:%M'))
-	initial_date = initial_date.replace(tzinfo=pytz.timezone('Europe/London'))
-	print(bool(initial_date.dst()))
-
-	# Initialise the schedule
-	work_hours    = 2*24
-	workday_start = get_5_min_time( 8,00)
-	workday_end   = get_5_min_time(16,00)
-	day_length    = get_5_min_time(24,00)
-
-	# Mutation rate (fraction)
-	mutation_rate = 0.05
-
-	# Threshold for success
-	threshold = 0.10
-
-	# Number of individuals in a generation
-	n_individuals = 20
-
-	# Read in the job files
-	jobs = []
-	for fname in fnames:
-		job = read_job_file(fname)
-		jobs.append(job)
-
-	# how many jobs?
-	n_jobs = len(jobs)
-
-	# how many tasks are there in my jobs?
-	n_tasks = 0
-	for job in jobs:
-		for experiment_name in job['order']:
-			if job[experiment_name][0]['flexible']:
-				n_tasks += len(job[experiment_name])
-			else:
-				n_tasks += 1
-
+def read_existing_events(existing_tasks, initial_date, debug=1):
+	'''Reads the events already in the calendar from a .csv or .ics file. If there isn't one, returns an empty list.'''
 	existing_jobs = []
 
+	if existing_tasks == None:
+		return existing_jobs
+
 	# Read in a csv file, if the extension matches
 	if existing_tasks[-4:]=='.csv':
 
@@ -800,29 +750,114 @@ def run_scheduler(fnames, destination='./', initial_date=None, existing_tasks=No
 		cal = Calendar.from_ical(file.read())
 
 		for event in cal.walk('vevent'):
-			existing_jobs.append(parse_ical_event(event, initial_date))
+			existing_jobs.append(parse_ical_event(event, initial_date, debug))
 
-	for task in existing_jobs:
-		print(task)
+	return existing_jobs
+
+def random_cohort(n_jobs, n_tasks, n_individuals, rng):
+	'''Makes a cohort of random individuals, one per row'''
+	return rng.integers(0, n_jobs, (n_individuals, n_tasks)).astype(job_table.gene_dtype(n_jobs))
+
+def n_parents(n_individuals):
+	'''How many of the best individuals in a cohort breed can pick as parents'''
+	return n_individuals//2 + 1
+
+def score_cohort(cohort_evaluator, cohort, work_hours, debug=0, cutoff=None):
+	'''Evaluates the whole cohort. Every schedule starts out work_hours long, and grows by a day at a time if
+	it needs to. Each is scored by its makespan, the slot after its last task ends.
+	Tasks only get skipped if they can never fit, however long the schedule is, so any individual that skips one
+	is killed off.
+
+	If cutoff is set, the last third of the cohort is only decoded far enough to tell whether each one scores
+	cutoff or better, and any that don't get a score of infinity. The first two thirds (that the spread is taken
+	over) are always scored in full. As long as there are enough that score cutoff or better to fill all of the
+	places that breed takes parents from, the rest don't need an exact score, as they aren't going to breed.
+	Otherwise, they get decoded in full after all.
+	returns:
+	cohort, cohort_results   for the survivors'''
+	if cutoff == None:
+		results = cohort_evaluator.evaluate(cohort, work_hours)
+	else:
+		n_first = int(2*len(cohort)/3)
+		results = cohort_evaluator.evaluate(cohort[:n_first], work_hours)
+		results += cohort_evaluator.evaluate(cohort[n_first:], work_hours, cutoff)
+
+		given_up = [x for x, (fitness, skipped_tasks) in enumerate(results) if fitness == None]
+		n_good = len([fitness for fitness, skipped_tasks in results if fitness != None and fitness <= cutoff])
+		if given_up and n_good < n_parents(len(cohort)):
+			for x, result in zip(given_up, cohort_evaluator.evaluate(cohort[given_up], work_hours)):
+				results[x] = result
+		elif given_up:
+			if debug:
+				print('%d individuals were given up on for scoring worse than %d' % (len(given_up), cutoff))
+			for x in given_up:
+				results[x] = (float('inf'), results[x][1])
+
+	cohort_results = []
+	for fitness, skipped_tasks in results:
+		if skipped_tasks:
+			cohort_results.append(None)
+			if debug:
+				print('This guy had to skip some tasks, which will never fit: %s' % ', '.join(skipped_tasks))
+		else:
+			cohort_results.append(fitness)
+
+	if None in cohort_results:
+		if debug:
+			print('%d individuals had to skip some tasks. Killing the weak.' % cohort_results.count(None))
+		survivors = [x for x, result in enumerate(cohort_results) if result != None]
+		cohort = cohort[survivors]
+		cohort_results = [cohort_results[x] for x in survivors]
+
+	return cohort, cohort_results
+
+def rank_cohort(cohort, cohort_results):
+	'''Sorts by ascending score, then by genes, so ties always come out in the same order'''
+	order = np.lexsort(tuple(cohort.T[::-1]) + (cohort_results,))
+	return cohort[order], [cohort_results[x] for x in order]
+
+def optimise(jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours=2*24, n_workers=1,
+	seed=None, debug=0, config=None):
+	'''Runs the genetic algorithm over the jobs, fitting them around the existing events.
+	n_workers is how many processes to score the cohort with (None for one per core), and seed makes the
+	search repeatable. config is a GAConfig with the size of each generation, how to breed them and when to
+	stop. The defaults are used if it's None.
+	returns:
+	best_individual, history
+	best_individual is None if the jobs can never all fit. history holds the best score and spread of each
+	generation, and how many chromosomes were scored.'''
+	if config == None:
+		config = ga_config.GAConfig()
+
+	# All the random numbers come from here
+	rng = np.random.default_rng(seed)
+
+	# how many jobs?
+	n_jobs = len(jobs)
+
+	# how many tasks are there in my jobs?
+	n_tasks = job_table.count_genes(jobs)
+
+	# All the chromosomes are scored by the evaluator. It sets up a decoder once for each of its processes, and
+	# remembers the score of every chromosome it sees.
+	cohort_evaluator = evaluator.make_evaluator(
+		jobs, existing_jobs, initial_date, workday_start, workday_end, n_workers,
+		checkpoint_bytes=config.checkpoint_bytes)
 
 	# Each permutation list will be of the length n_tasks, and contain any combination of the numbers 0 - (n_jobs-1)
 	# i.e. [ [0,0,0,0], [0,0,0,1], [0,0,0,2], [0,0,1,0], ... [2,2,2,2] ]
-	# Generate each permutation list as a number in base (n_jobs) between 00000... and 99999... or whatever (base-1) is
-	# This can then be converted to a list of integers that will suggest the next task to attempt
-	final_perm = str(n_jobs-1) * n_tasks
-	final_perm = str2int(final_perm, n_jobs)
-	print('Using a genetic algorithm to search for the best of %.3g different permutations.' % (final_perm))
+	# so there are n_jobs**n_tasks of them, which soon gets far too big for a float
+	if debug:
+		print('Using a genetic algorithm to search for the best of %s different permutations.' %
+			job_table.count_chromosomes(n_jobs, n_tasks))
 
 	# initialise the cohort
 	# cohort =  rand.sample(xrange(final_perm), n_individuals) # Doesnt work for large parameter spaces
 	# cohort =  [toStr(permutation, n_jobs).rjust(n_tasks, '0') for permutation in cohort]
-	cohort = []
-	for i in range(n_individuals):
-		new_individual = []
-		for j in range(n_tasks):
-			new_individual.append(rand.randint(0, n_jobs-1))
-		cohort.append(new_individual)
-	cohort_results = [0 for x in cohort]
+	cohort = random_cohort(n_jobs, n_tasks, config.n_individuals, rng)
+	if config.seed_rules:
+		engine = schedule_engine.GridEngine(jobs, existing_jobs, initial_date, workday_start, workday_end)
+		dispatch_rules.seed_cohort(cohort, engine)
 
 	# History
 	best_scores = []
@@ -830,87 +865,71 @@ def run_scheduler(fnames, destination='./', initial_date=None, existing_tasks=No
 	deviations  = []
 	best_individuals = []
 	n = 0
+	history = {'best_scores': best_scores, 'deviations': deviations, 'evaluations': 0}
 
-	# Stop the algorithm after seeing no new minimum for 3 generations
+	# Stop the algorithm after seeing no new minimum for config.patience generations
 	stop = 0
 
-	print('Generation  - Best - std. dev. - fitness')
+	progress = bounds.SearchProgress(jobs, existing_jobs, initial_date, workday_start, workday_end, history, debug)
+	if debug:
+		print('Generation  - Best - std. dev. - spread - gap')
 
+	cutoff = None
 	cont = True
 	while cont:
 		n += 1
 
-		times = []
-		# Consider each individual in the cohort
-		for x, permutation in enumerate(cohort):
-			# Evaluate the individual
-
-			t0 = time.time()
-
-			job_schedules, skipped_tasks = generate_schedule(
-				initial_date,
-				existing_jobs, jobs,
-				permutation,
-				workday_start, workday_end,
-				debug,
-				work_hours=work_hours
-				)
-
-			times.append(time.time()-t0)
-			perm_index = 0
-
-			cohort_results[x] = len(job_schedules[0])
-
-			if skipped_tasks:
-				cohort_results[x] = None
-				if debug:
-					print('This guy had to skip some tasks. Adding an extra day to the schedule...')
-				work_hours += 24
-				if debug:
-					print('The workday is now %d hours long' % work_hours)
-
-		while None in cohort_results and len(cohort_results)!=0:
-			print('This individual had to skip some tasks. Killing the weak.')
-			index = cohort_results.index(None)
-			del cohort[index]
-			del cohort_results[index]
-
-		if len(cohort) <= 1:
-			print("'I couldn't find a solution to this set of jobs.")
-			print(" I'll run again with debugging enabled to show you what tasks are causing problems.")
-			debug = 1
-			permutation = []
-			for j in range(n_tasks):
-				permutation.append(rand.randint(0, n_jobs-1))
-
-			job_schedules, skipped_tasks = generate_schedule(
-				initial_date,
-				existing_jobs, jobs,
-				permutation,
-				workday_start, workday_end,
-				debug,
-				work_hours=work_hours
-				)
-
+		# Evaluate the whole cohort, and kill off any that can't fit
+		t0 = time.time()
+		scored = cohort
+		cohort, cohort_results = score_cohort(cohort_evaluator, cohort, work_hours, debug, cutoff)
+		times = [(time.time()-t0) / len(scored)]
+		history['evaluations'] += len(scored)
+
+		# Nobody survived, so there's no schedule to write. Their scores are all cached, so it's cheap to look up
+		# which tasks they had to skip.
+		if not len(cohort):
+			if debug:
+				never_fit = set()
+				for fitness, skipped_tasks in cohort_evaluator.evaluate(scored, work_hours):
+					never_fit.update(skipped_tasks)
+				print("I couldn't find a solution to this set of jobs. These tasks never fit: %s" %
+					', '.join(sorted(never_fit)))
+			cohort_evaluator.close()
+			return None, history
+
+		# There's nothing to breed one individual with, so it'll have to do
+		if len(cohort) == 1:
+			if debug:
+				print('Only one individual could fit everything in, so there is nothing to breed it with.')
 			cont = False
 
 		# Save the best individual, std, and best score for each generation
+		n_ranked = max(1, int(2*len(cohort_results)/3))
 		best_scores.append(min(cohort_results))
-		best_individuals.append(cohort[cohort_results.index(best_scores[-1])])
-		std = np.std(cohort_results[:int(2*len(cohort_results)/3)])
+		best_individuals.append(cohort[cohort_results.index(best_scores[-1])].copy())
+		std = np.std(cohort_results[:n_ranked])
 		deviations.append(std)
+		spread = bounds.spread(cohort_results[:n_ranked], progress.bound)
+
+		# breed cohort - score is the slot after its last task ends.
+		cohort, cohort_results = rank_cohort(cohort, cohort_results)
 
-		# breed cohort - score is the number of slots it needs.
-		## Sort by ascending score
-		cohort_results, cohort = (list(t) for t in zip(*sorted(zip(cohort_results, cohort))))
+		# Next time, only the ones that could beat the worst parent this time need an exact score
+		cutoff = cohort_results[min(n_parents(len(cohort_results)), len(cohort_results)) - 1]
 
 		if debug > 1:
 			for individual, result in zip(cohort, cohort_results):
-				print('%s - %d' % (''.join([str(x) for x in individual]), result))
+				print('%s - %s' % (''.join([str(x) for x in individual]), result))
 			print('This cohort took an average of %lfs to generate.' % np.mean(times))
 
-		# If the standard deviation of the cohort is less than 20%, we are converged
-		print('      %3d   - %4d - %9.2lf - %.2lf' % (n, min(cohort_results), std, std/min(cohort_results)))
+		# How far the best so far is from the best there could be
+		gap = progress.record_gap(min(best_scores))
+
+		# If the standard deviation of the cohort is small next to the room left for improvement, we are converged
+		if debug:
+			print('      %3d   - %4d - %9.2lf - %6.2lf - %.1lf%%' % (
+				n, min(cohort_results), std, spread, 100*gap))
 
 		if n-1:
 			if min(cohort_results) < best_scores[n-2]:
@@ -918,29 +937,112 @@ def run_scheduler(fnames, destination='./', initial_date=None, existing_tasks=No
 			else:
 				stop += 1
 
-		if stop >= 5:
-			cont = False
-
-		if std/min(cohort_results) < threshold:
-			print('Threshold reached!')
+		reason = progress.stop_reason(config, n, stop, spread, min(best_scores))
+		if reason != None:
+			if debug:
+				print(reason)
 			cont = False
 
-		cohort = breed(n_jobs, mutation_rate, threshold, n_individuals, n_tasks, cohort, cohort_results)
+		cohort = breed(n_jobs, config, cohort, rng)
 		cohort_results = [0 for x in cohort]
 
+	cohort_evaluator.close()
+
+	if debug:
+		cache = cohort_evaluator.cache
+		print('Scored %d different chromosomes, and reused %d scores (%.0f%% of lookups)' %
+			(cache.misses, cache.hits, 100*cache.hit_rate()))
+
 	#### Done! ####
 
 	best_individual = best_individuals[best_scores.index(min(best_scores))]
-	print('The best individual was %s' % ''.join([str(x) for x in best_individual]))
+	if debug:
+		print('The best individual was %s' % ''.join([str(x) for x in best_individual]))
+
+	history['generations'] = n
+	progress.finish()
+	return best_individual, history
+
+def run_scheduler(fnames, destination='./', initial_date=None, existing_tasks=None, n_workers=1, seed=None,
+	debug=10, copy_to_desktop=True, config=None, search='ga', n_islands=None):
+	'''Finds a good schedule for the jobs in fnames, and writes it to an .ics file in destination.
+	existing_tasks is a .csv or .ics file of events that are already in the calendar, or None.
+	n_workers is how many processes to score the cohort with (None for one per core), and seed makes the
+	search repeatable. debug sets how much to print (0 for nothing), and copy_to_desktop puts a copy of the
+	.ics file on the Desktop too. config is the GAConfig to pass on to optimise.
+	search picks how to look for the best chromosome:
+	'ga'      - the genetic algorithm in optimise
+	'islands' - n_islands populations, each in its own process (see islands.py). n_workers is ignored.
+	'steady'  - a steady-state genetic algorithm that keeps n_workers processes busy (see steady_state.py)
+	'anneal'  - simulated annealing from a random chromosome (see local_search.py)
+	'tabu'    - tabu search from a random chromosome (see local_search.py)
+	'dispatch'- the best of the dispatch rules, with no searching at all (see dispatch_rules.py). Takes well
+	            under a second, and is often good enough.
+	'exact'   - search every chromosome, without repeats, to find the very best (see exact_solver.py). Only for
+	            small sets of jobs! n_workers and seed are ignored.'''
+	# print(datetime.datetime.strftime(initial_date, '%m/%d/%Y %H:%M'))
+	initial_date = initial_date.replace(tzinfo=pytz.timezone('Europe/London'))
+	if debug:
+		print(bool(initial_date.dst()))
 
-	job_schedules, skipped_tasks = generate_schedule(
-		initial_date,
-		existing_jobs, jobs,
-		best_individual,
-		workday_start, workday_end,
-		0,
-		work_hours=work_hours
-		)
+	# Initialise the schedule
+	work_hours    = 2*24
+	workday_start = get_5_min_time( 8,00)
+	workday_end   = get_5_min_time(16,00)
+	day_length    = get_5_min_time(24,00)
+
+	# Read in the job files
+	jobs = []
+	for fname in fnames:
+		job = read_job_file(fname)
+		jobs.append(job)
+
+	# how many jobs?
+	n_jobs = len(jobs)
+
+	existing_jobs = read_existing_events(existing_tasks, initial_date, debug)
+
+	if debug:
+		for task in existing_jobs:
+			print(task)
+
+	# The other searches all use the functions in here, so they're only imported once they're wanted
+	if search == 'ga':
+		best_individual, history = optimise(
+			jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours, n_workers, seed, debug, config)
+	elif search == 'islands':
+		import islands
+		best_individual, history = islands.run_islands(
+			jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours, n_islands, seed, debug, config)
+	elif search == 'steady':
+		import steady_state
+		best_individual, history = steady_state.run_steady_state(
+			jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours, n_workers, seed, debug, config)
+	elif search == 'anneal':
+		import local_search
+		best_individual, history = local_search.anneal(
+			jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours, n_workers, seed, debug, config)
+	elif search == 'tabu':
+		import local_search
+		best_individual, history = local_search.tabu(
+			jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours, n_workers, seed, debug, config)
+	elif search == 'dispatch':
+		best_individual, history = dispatch_rules.run_dispatch(
+			jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours, debug)
+	elif search == 'exact':
+		import exact_solver
+		best_individual, history = exact_solver.solve(
+			jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours, debug, config)
+	else:
+		raise ValueError("Unknown search '%s'" % search)
+
+	if best_individual is None:
+		return None
+
+	# Decode the winner again, to get its schedule
+	engine = schedule_engine.GridEngine(jobs, existing_jobs, initial_date, workday_start, workday_end)
+	grid, skipped_tasks = engine.generate_schedule(best_individual, work_hours=work_hours)
+	job_schedules = engine.job_schedules(grid)
 
 	# print_schedule(initial_date, existing_jobs, workday_start, workday_end, jobs, best_individual, work_hours)
 
@@ -951,7 +1053,8 @@ def run_scheduler(fnames, destination='./', initial_date=None, existing_tasks=No
 	# The name of the csv file to produce
 	oname = 'Schedule_%s_%s-jobs.ics' % (now.strftime("%d-%m-%y-%Hh%Mm"), n_jobs)
 
-	print('Creating a .ics file of this schedule for importing into google calendar.')
+	if debug:
+		print('Creating a .ics file of this schedule for importing into google calendar.')
 
 	# Desktop
 	desktop_loc = os.path.expanduser("~/Desktop") +'/'+ oname
@@ -961,7 +1064,8 @@ def run_scheduler(fnames, destination='./', initial_date=None, existing_tasks=No
 		destination += '/Schedules'
 
 	oname = destination+'/'+oname
-	print('File will be called %s' % oname)
+	if debug:
+		print('File will be called %s' % oname)
 
 	if not os.path.isdir(destination):
 		os.makedirs(destination)
@@ -969,7 +1073,8 @@ def run_scheduler(fnames, destination='./', initial_date=None, existing_tasks=No
 
 	cal = Calendar()
 	cal.add('version', '2.0')
-	print("The winning job schedule was {}".format(job_schedules[:-1]))
+	if debug:
+		print("The winning job schedule was {}".format(job_schedules[:-1]))
 	for j, schedule in enumerate(job_schedules[:-1]):
 		# Get the first task in the schedule
 		tasks = ['']
@@ -977,7 +1082,8 @@ def run_scheduler(fnames, destination='./', initial_date=None, existing_tasks=No
 			if t not in tasks: tasks.append(t)
 		tasks = tasks[1:]
 		task_ID = tasks[0]
-		print("First task ID is '{}'".format(task_ID))
+		if debug:
+			print("First task ID is '{}'".format(task_ID))
 		while task_ID:
 			# Get the first and last slots of this task
 			try:
@@ -1016,7 +1122,8 @@ def run_scheduler(fnames, destination='./', initial_date=None, existing_tasks=No
 			event.add('uid', UID)
 
 			# Add it to the calendar
-			print("Event: {}".format(event))
+			if debug:
+				print("Event: {}".format(event))
 			cal.add_component(event)
 
 			task_ID = incriment_ID(existing_jobs, jobs, task_ID)
@@ -1025,8 +1132,10 @@ def run_scheduler(fnames, destination='./', initial_date=None, existing_tasks=No
 	f.write(cal.to_ical())
 	f.close()
 
-	print("I'll copy to %s" % desktop_loc)
-	copyfile(oname, desktop_loc)
+	if copy_to_desktop:
+		if debug:
+			print("I'll copy to %s" % desktop_loc)
+		copyfile(oname, desktop_loc)
 
 	return oname
 
@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+A decoder that keeps the schedule as intervals rather than slots.
+
+GridEngine keeps a grid with a column for every 5 minute slot, so a 10 hour reaction fills 120 of them, and a few
+weeks of schedule is thousands of columns long whatever is in it. This engine only keeps:
+
+ - records[job]     the (start, stop, code) runs of each task a job has placed, in order of start
+ - busy             the stretches of slots where something active has been placed, as sorted lists of where each
+                    one starts and stops
+ - n_slots          how long the grid would have got by now, which is all that's left of it
+
+The existing events are the same for every chromosome, so their busy stretches are worked out once, from the same
+blocking row as GridEngine uses. Checking whether a block fits is a bisect into each list of busy stretches for
+each run of active slots in the block, and on a clash the block jumps straight past the stretch it hit. So memory
+and time go with the number of tasks (and days) rather than the number of slots.
+
+Nights and weekends are most of the week, and nothing active can ever go in them, so they aren't busy stretches
+at all. Instead, active runs are checked in working time, where only the working slots are counted: _work_before
+maps each slot to how many working slots there are before it, and _work_slot maps them back. A run is clear of
+the nights if it covers as many working slots as it is long, and if not, it goes straight to the start of the
+next stretch of working time. Inactive slots still go through the nights as usual.
+
+The placement rules are exactly those of GridEngine.decode, down to the odd cases where a block is placed over
+the end of an earlier block from the same job, so a permutation always gives the same schedule and the same
+score. generate_schedule turns the intervals back into a grid, for writing the schedule out.
+'''
+
+import bisect
+
+import numpy as np
+
+import job_table
+import schedule_engine
+from job_table import EMPTY, NONE
+
+# Rough cost of storing each record or busy stretch in a checkpoint: the tuple or ints, and the list slots
+RECORD_BYTES = 80
+
+class IntervalSchedule(object):
+	'''Everything a decode has placed so far'''
+
+	def __init__(self, n_jobs, n_slots):
+		self.records = [[] for job_index in range(n_jobs)]
+		self.starts  = []
+		self.stops   = []
+		self.n_slots = n_slots
+
+	def copy(self):
+		schedule = IntervalSchedule(0, self.n_slots)
+		schedule.records = [list(records) for records in self.records]
+		schedule.starts  = list(self.starts)
+		schedule.stops   = list(self.stops)
+		return schedule
+
+	def nbytes(self):
+		'''Roughly how much memory this takes'''
+		return RECORD_BYTES * (sum(len(records) for records in self.records) + len(self.starts))
+
+	def add_busy(self, start, stop):
+		'''Marks slots start up to stop as busy. Nothing active is ever placed over anything active, so they can't
+		overlap a stretch that's already busy.'''
+		x = bisect.bisect_left(self.starts, start)
+		self.starts.insert(x, start)
+		self.stops.insert(x, stop)
+
+	def remove_busy(self, start, stop):
+		'''Marks slots start up to stop as not busy, cutting down any stretches that cover them'''
+		x = bisect.bisect_right(self.stops, start)
+		pieces = []
+		y = x
+		while y < len(self.starts) and self.starts[y] < stop:
+			if self.starts[y] < start:
+				pieces.append((self.starts[y], start))
+			if self.stops[y] > stop:
+				pieces.append((stop, self.stops[y]))
+			y += 1
+		self.starts[x:y] = [piece[0] for piece in pieces]
+		self.stops[x:y]  = [piece[1] for piece in pieces]
+
+class IntervalCheckpoint(object):
+	'''The same as Checkpoint, for an IntervalSchedule'''
+
+	def __init__(self, schedule, current_tasks, frontier, skipped_tasks, perm_index, end):
+		self.schedule = schedule.copy()
+
+		self.current_tasks = tuple(current_tasks)
+		self.frontier      = tuple(frontier)
+		self.skipped_tasks = tuple(skipped_tasks)
+		self.perm_index    = perm_index
+		self.end           = end
+
+		self.n_slots = schedule.n_slots
+		self.nbytes  = schedule.nbytes()
+
+	def restore(self):
+		'''Returns a fresh copy of the state, ready to carry on decoding'''
+		return (self.schedule.copy(), list(self.current_tasks), list(self.frontier), list(self.skipped_tasks),
+			self.perm_index, self.end)
+
+class IntervalEngine(schedule_engine.GridEngine):
+	'''Decodes chromosomes just like GridEngine, but with intervals instead of a grid. Everything that doesn't
+	depend on how the schedule is stored comes from GridEngine, including the footprint of each task's block,
+	which has the runs of tasks and of active slots that placing it needs.'''
+
+	def __init__(self, jobs, existing_jobs, initial_date, workday_start, workday_end):
+		super(IntervalEngine, self).__init__(jobs, existing_jobs, initial_date, workday_start, workday_end)
+		self._code_active = self.table.active.tolist()
+
+		# The calendar's busy stretches and working time, worked out from the template whenever that gets longer
+		self._calendar_length = -1
+		self._calendar_starts = []
+		self._calendar_stops  = []
+		self._work_before  = [0]
+		self._work_slot    = []
+		self._next_stretch = []
+
+	def calendar(self, stop):
+		'''Returns the busy stretches of the calendar in working hours, as lists of starts and stops, covering at
+		least up to stop. This also brings the working time tables up to there.'''
+		self.template(0, stop)
+		if len(self._template_active) != self._calendar_length:
+			working = self._template_row != self.table.night_code
+			offsets, lengths = schedule_engine.active_runs(self._template_active * working)
+			self._calendar_starts = offsets.tolist()
+			self._calendar_stops  = (offsets + lengths).tolist()
+			work_slot = np.flatnonzero(working)
+			self._work_before = np.concatenate(([0], np.cumsum(working))).tolist()
+			self._work_slot   = work_slot.tolist()
+			# For each working slot, where the next stretch of working time starts, counted in working time
+			stretches = np.flatnonzero(np.diff(work_slot) != 1) + 1
+			self._next_stretch = np.append(stretches, len(work_slot))[
+				np.searchsorted(stretches, np.arange(len(work_slot)), 'right')].tolist()
+			self._calendar_length = len(self._template_active)
+		return self._calendar_starts, self._calendar_stops
+
+	def empty_schedule(self, work_hours):
+		'''A schedule with nothing in it yet, work_hours long'''
+		return IntervalSchedule(self.n_jobs, job_table.get_5_min_time(work_hours))
+
+	def first_fit(self, schedule, starter, start, stop):
+		'''Returns the first slot in range(start, stop) where starter's block can go without any of its active
+		slots landing on anything busy, or None if there isn't one'''
+		active_runs = self.footprints[starter].active_runs
+
+		# A week more than the block needs always goes past a weekend, so there's always a next stretch of
+		# working time
+		busy = (self.calendar(stop + self._max_offset(active_runs) + self.week_length),
+			(schedule.starts, schedule.stops))
+		work_before, work_slot, next_stretch = self._work_before, self._work_slot, self._next_stretch
+		i = start
+		while i < stop:
+			# Each run of active slots says how far along the block has to go for that run to be clear, and it has
+			# to go as far as the furthest of them
+			clear = i
+			for offset, length in active_runs:
+				first = i + offset
+				work = work_before[first]
+				if work_before[first+length] - work != length:
+					# It runs into the night, so it has to start in the next stretch of working time. If it
+					# started in the night, that's the next working slot.
+					if work < len(work_slot) and work_slot[work] == first:
+						work = next_stretch[work]
+					if work == len(work_slot):
+						# There's no working time left at all
+						return None
+					clear = max(clear, work_slot[work] - offset)
+					continue
+				for starts, stops in busy:
+					# The first stretch that stops after the run starts is the first one that can overlap it. If
+					# it does, the run has to start after it, and so on until there's a gap it fits in.
+					x = bisect.bisect_right(stops, first)
+					while x < len(stops) and starts[x] < first + length:
+						first = stops[x]
+						x += 1
+				clear = max(clear, first - offset)
+			if clear == i:
+				return i
+			i = clear
+		return None
+
+	def _max_offset(self, active_runs):
+		if not active_runs:
+			return 0
+		offset, length = active_runs[-1]
+		return offset + length
+
+	def generate_schedule(self, permutation, work_hours=7*24, cutoff=None):
+		'''Generates a schedule from a given permutation, just like GridEngine.generate_schedule.
+		returns:
+		grid, skipped_tasks'''
+		schedule, skipped_tasks, checkpoints, end = self.decode(permutation, work_hours, cutoff=cutoff)
+		if schedule is None:
+			return None, skipped_tasks
+		return self.to_grid(schedule), skipped_tasks
+
+	def to_grid(self, schedule):
+		'''Fills in the grid that GridEngine would have made'''
+		grid = np.full((self.n_jobs+1, schedule.n_slots), EMPTY, dtype=np.int32)
+		grid[-1] = self.template(0, schedule.n_slots)[0]
+		for job_index, records in enumerate(schedule.records):
+			for start, stop, code in records:
+				grid[job_index, start:stop] = code
+		return grid
+
+	def decode(self, permutation, work_hours=7*24, checkpoint=None, checkpoint_every=0, cutoff=None, n_genes=None):
+		'''Works just like GridEngine.decode, but the schedule comes back as an IntervalSchedule (or None if it was
+		given up on).
+		returns:
+		schedule, skipped_tasks, checkpoints, end'''
+		n_jobs = self.n_jobs
+		permutation = np.asarray(permutation).tolist()
+
+		if checkpoint == None:
+			schedule = self.empty_schedule(work_hours)
+			current_tasks = self.table.job_first.tolist()
+			frontier = [1] * n_jobs
+			skipped_tasks = []
+			perm_index = 0
+			end = 0
+		else:
+			schedule, current_tasks, frontier, skipped_tasks, perm_index, end = checkpoint.restore()
+		n_finished = current_tasks.count(NONE)
+
+		if cutoff != None:
+			min_end = max([end] + [self.earliest_end(start, code)
+				for start, code in zip(frontier, current_tasks) if code != NONE])
+
+		checkpoints = []
+		resumed_at = perm_index
+		while n_finished != n_jobs and perm_index != n_genes:
+			if cutoff != None and min_end > cutoff:
+				return None, skipped_tasks, checkpoints, end
+
+			if checkpoint_every and perm_index % checkpoint_every == 0 and perm_index != resumed_at:
+				checkpoints.append(IntervalCheckpoint(
+					schedule, current_tasks, frontier, skipped_tasks, perm_index, end))
+
+			job_index = permutation[perm_index]
+			while current_tasks[job_index] == NONE:
+				job_index = (job_index + 1) % n_jobs
+			perm_index += 1
+
+			starter = current_tasks[job_index]
+			footprint = self.footprints[starter]
+			next_task = footprint.next_task
+			block_length = footprint.length
+			start = frontier[job_index]
+
+			# GridEngine would add days until the block fits, or until it has tried a whole week of starting slots
+			# past the last event and the last task. It never uses the last slot of the grid.
+			stop = schedule.n_slots - block_length
+			quiet_from = max(start, self.events_end, end)
+			last_stop = stop
+			if last_stop < quiet_from + self.week_length:
+				n_days = -(-(quiet_from + self.week_length - last_stop) // self.day_length)
+				last_stop += n_days * self.day_length
+
+			i = self.first_fit(schedule, starter, start, last_stop)
+			if i == None:
+				schedule.n_slots += last_stop - stop
+				skipped_tasks.append(self.table.ids[starter])
+			else:
+				if i >= stop:
+					schedule.n_slots += ((i - stop) // self.day_length + 1) * self.day_length
+				self.place(schedule, job_index, starter, i)
+				if footprint.end:
+					end = max(end, i+footprint.end)
+
+			current_tasks[job_index] = next_task
+			if next_task == NONE:
+				n_finished += 1
+			elif i != None and self._frontier_offset[starter]:
+				frontier[job_index] = i + self._frontier_offset[starter]
+			else:
+				frontier[job_index] = self.find_frontier(schedule, job_index, next_task)
+
+			if cutoff != None:
+				min_end = max(min_end, end)
+				if next_task != NONE:
+					min_end = max(min_end, self.earliest_end(frontier[job_index], next_task))
+
+		if n_genes != None:
+			checkpoints.append(IntervalCheckpoint(schedule, current_tasks, frontier, skipped_tasks, perm_index, end))
+
+		return schedule, skipped_tasks, checkpoints, end
+
+	def place(self, schedule, job_index, starter, i):
+		'''Puts starter's block into the schedule at slot i'''
+		footprint = self.footprints[starter]
+		records = schedule.records[job_index]
+		window_stop = i + footprint.length
+
+		# The block replaces whatever the job already has under it, even where it's empty
+		if records and records[-1][1] > i:
+			self.clear(schedule, job_index, i, window_stop)
+		x = bisect.bisect_left(records, (i,))
+		records[x:x] = [(i+offset, i+offset+length, code) for offset, length, code in footprint.runs]
+		self.mark_busy(schedule, starter, i)
+
+	def mark_busy(self, schedule, starter, i):
+		'''Marks the active slots of starter's block, placed at slot i, as busy'''
+		for offset, length in self.footprints[starter].active_runs:
+			schedule.add_busy(i+offset, i+offset+length)
+
+	def clear(self, schedule, job_index, start, stop):
+		'''Takes everything from slot start up to stop out of a job's records, and anything active there stops
+		being busy'''
+		records = schedule.records[job_index]
+		x = bisect.bisect_left(records, (start,))
+		if x and records[x-1][1] > start:
+			x -= 1
+		pieces = []
+		y = x
+		while y < len(records) and records[y][0] < stop:
+			first, last, code = records[y]
+			if first < start:
+				pieces.append((first, start, code))
+			if last > stop:
+				pieces.append((stop, last, code))
+			if self._code_active[code]:
+				schedule.remove_busy(max(first, start), min(last, stop))
+			y += 1
+		records[x:y] = pieces
+
+	def find_frontier(self, schedule, job_index, code):
+		'''Looks through a job's records for the slot after the last one of the task before code'''
+		prev_task = self._prev[code]
+		if prev_task != NONE:
+			for first, last, task in reversed(schedule.records[job_index]):
+				if task == prev_task:
+					return last
+		return 1
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+The island model: several populations evolve side by side, each in its own process and with its own seed, so a
+single population converging early doesn't end the search.
+
+Every few generations, each island sends copies of its best individuals on to the next island round a ring, where
+they replace the worst of the children. Only the migrants and a summary of each island's progress go through the
+pipes; each island keeps its own evaluator, cache and cohort. Each island evolves just as optimise does, with
+score_cohort, rank_cohort and breed from genetic_scheduler.
+
+The islands all stop and swap migrants at the same time, so a run with a given seed always gives the same result,
+however the processes happen to be scheduled. Each island also checks the lower bound, and its share of the
+evaluations and time left, after every generation, so a run doesn't go on for the rest of a migration interval
+once it should have stopped.
+'''
+
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+import bounds
+import dispatch_rules
+import evaluator
+import ga_config
+import genetic_scheduler as gs
+import job_table
+import schedule_engine
+
+# How many generations between migrations
+MIGRATION_INTERVAL = 5
+
+# How many individuals each island sends on at each migration
+N_MIGRANTS = 2
+
+def _island(conn, jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours, config, n_migrants,
+	seed, bound):
+	'''Runs one island, in its own process. It waits for orders on conn of
+	(n_generations, immigrants, evaluations_left, seconds_left)
+	evolves for that many generations, or fewer if it reaches the lower bound, scores evaluations_left chromosomes
+	or runs out of time (None for no limit), then replies with
+	(best_scores, best_individuals, emigrants, n_evaluations, spread)
+	best_scores and best_individuals have one entry for each generation, and spread is the standard deviation of
+	the last generation's scores (see bounds.spread). None tells the island to stop.'''
+	rng = np.random.default_rng(seed)
+	n_jobs  = len(jobs)
+	n_tasks = job_table.count_genes(jobs)
+
+	cohort_evaluator = evaluator.make_evaluator(
+		jobs, existing_jobs, initial_date, workday_start, workday_end, n_workers=1,
+		checkpoint_bytes=config.checkpoint_bytes)
+	cohort = gs.random_cohort(n_jobs, n_tasks, config.n_individuals, rng)
+	if config.seed_rules:
+		engine = schedule_engine.GridEngine(jobs, existing_jobs, initial_date, workday_start, workday_end)
+		dispatch_rules.seed_cohort(cohort, engine)
+	cutoff = None
+
+	while True:
+		orders = conn.recv()
+		if orders == None:
+			break
+		n_generations, immigrants, evaluations_left, seconds_left = orders
+		t_stop = None if seconds_left == None else time.time() + seconds_left
+
+		# The newcomers take the places of the worst of the children. They can also bring a dead island back to life.
+		if not len(cohort):
+			cohort = immigrants.copy()
+			cutoff = None
+		elif len(immigrants):
+			n_immigrants = min(len(immigrants), len(cohort))
+			cohort[len(cohort)-n_immigrants:] = immigrants[:n_immigrants]
+
+		best_scores, best_individuals = [], []
+		emigrants = cohort[:0]
+		n_evaluations = 0
+		spread = 0.
+		for generation in range(n_generations):
+			if not len(cohort):
+				break
+			n_evaluations += len(cohort)
+			cohort, cohort_results = gs.score_cohort(cohort_evaluator, cohort, work_hours, cutoff=cutoff)
+			if not len(cohort):
+				break
+
+			best_scores.append(min(cohort_results))
+			best_individuals.append(cohort[cohort_results.index(best_scores[-1])].copy())
+			spread = bounds.spread(cohort_results[:max(1, int(2*len(cohort_results)/3))], bound)
+
+			cohort, cohort_results = gs.rank_cohort(cohort, cohort_results)
+			cutoff = cohort_results[min(gs.n_parents(len(cohort_results)), len(cohort_results)) - 1]
+			emigrants = cohort[:n_migrants].copy()
+			cohort = gs.breed(n_jobs, config, cohort, rng)
+
+			# The main process would only stop everything at the next migration
+			if best_scores[-1] <= bound:
+				break
+			if evaluations_left != None and n_evaluations >= evaluations_left:
+				break
+			if t_stop != None and time.time() >= t_stop:
+				break
+
+		conn.send((best_scores, best_individuals, emigrants, n_evaluations, spread))
+
+	cohort_evaluator.close()
+	conn.close()
+
+def run_islands(jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours=2*24, n_islands=None,
+	seed=None, debug=0, config=None, migration_interval=MIGRATION_INTERVAL, n_migrants=N_MIGRANTS):
+	'''Runs the genetic algorithm on n_islands populations at once (None for one per core), each the size given in
+	config. They swap n_migrants of their best individuals every migration_interval generations. The stopping
+	rules in config are checked at each migration, against the best score over all the islands, and the widest
+	spread of scores on any island.
+	returns:
+	best_individual, history
+	just like optimise.'''
+	if config == None:
+		config = ga_config.GAConfig()
+	if n_islands == None:
+		n_islands = os.cpu_count()
+
+	n_tasks = job_table.count_genes(jobs)
+	no_migrants = np.zeros((0, n_tasks), dtype=job_table.gene_dtype(len(jobs)))
+
+	best_scores = []
+	spreads = []
+	history = {'best_scores': best_scores, 'spreads': spreads, 'evaluations': 0, 'islands': n_islands}
+	best_score, best_individual = None, None
+	generation = 0
+	stale = 0
+
+	if debug:
+		print('Evolving %d islands of %d individuals' % (n_islands, config.n_individuals))
+	progress = bounds.SearchProgress(jobs, existing_jobs, initial_date, workday_start, workday_end, history, debug)
+
+	# Every island gets its own stream of random numbers, all drawn from the one seed
+	seeds = np.random.SeedSequence(seed).spawn(n_islands)
+
+	conns, processes = [], []
+	for island_seed in seeds:
+		conn, island_conn = multiprocessing.Pipe()
+		process = multiprocessing.Process(
+			target=_island,
+			args=(island_conn, jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours, config,
+				n_migrants, island_seed, progress.bound),
+			)
+		process.daemon = True
+		process.start()
+		conns.append(conn)
+		processes.append(process)
+
+	if debug:
+		print('Generation  - Best - spread - gap')
+
+	migrants = [no_migrants] * n_islands
+	try:
+		while True:
+			# Don't go past the last generation, and split what's left of the evaluations between the islands
+			n_generations = migration_interval
+			if config.max_generations != None:
+				n_generations = max(1, min(n_generations, config.max_generations - generation))
+			evaluations_left, seconds_left = None, None
+			if config.max_evaluations != None:
+				evaluations_left = -(-(config.max_evaluations - history['evaluations']) // n_islands)
+			if config.time_limit != None:
+				seconds_left = config.time_limit - progress.seconds()
+
+			for conn, immigrants in zip(conns, migrants):
+				conn.send((n_generations, immigrants, evaluations_left, seconds_left))
+			replies = [conn.recv() for conn in conns]
+
+			# Find the best of all the islands in each generation
+			for g in range(n_generations):
+				scores = [(reply[0][g], x) for x, reply in enumerate(replies) if len(reply[0]) > g]
+				if not scores:
+					break
+				generation += 1
+				score, x = min(scores)
+				best_scores.append(score)
+				if best_score == None or score < best_score:
+					best_score, best_individual = score, replies[x][1][g]
+					stale = 0
+				else:
+					stale += 1
+
+			history['evaluations'] += sum(reply[3] for reply in replies)
+
+			alive = [reply for reply in replies if reply[0]]
+			if not alive:
+				if debug:
+					print("I couldn't find a solution to this set of jobs.")
+				break
+
+			spread = max(reply[4] for reply in alive)
+			spreads.append(spread)
+			gap = progress.record_gap(best_score)
+			if debug:
+				print('      %3d   - %4d - %6.2lf - %.1lf%%' % (generation, best_score, spread, 100*gap))
+
+			reason = progress.stop_reason(config, generation, stale, spread, best_score)
+			if reason != None:
+				if debug:
+					print(reason)
+				break
+
+			# Send the best of each island on to the next one
+			migrants = [replies[x-1][2] for x in range(n_islands)]
+	finally:
+		for conn in conns:
+			try:
+				conn.send(None)
+			except (BrokenPipeError, EOFError):
+				pass
+		for process in processes:
+			process.join()
+
+	history['generations'] = generation
+	progress.finish()
+	if debug and best_individual is not None:
+		print('The best individual was %s' % ''.join([str(x) for x in best_individual]))
+
+	return best_individual, history
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Flattens the job dicts into integer arrays, once, so that the schedule engines never have to touch an ID string.
+
+Every task gets a dense integer code. Job tasks are numbered in order (job, then experiment, then task), so the
+tasks of an experiment are always a contiguous range of codes. After the job tasks come the existing events, then
+the conflict and night time markers, and finally the empty slot, so that indexing any per-code array with
+EMPTY (-1) gives the empty slot's entry.
+
+The next/prev links follow the same rules as incriment_ID and decriment_ID in genetic_scheduler, including their
+edge cases (e.g. a job stops at an empty experiment). Links that go nowhere are NONE.
+The ID strings are kept in table.ids, for turning a finished schedule back into a calendar.
+'''
+
+import math
+
+import numpy as np
+
+# Code for an empty slot, or a link to nothing
+EMPTY = -1
+NONE  = -1
+
+def get_5_min_time(hh, mm=0):
+	'''takes hours and minutes, and converts it to the proper index for the schedule. Rounds mm DOWN to the nearest 5'''
+	# an hour in minutes
+	hh = int(float(hh)*60)
+
+	mm = int(mm)
+
+	# Make sure it's an int, so it rounds down to the nearest slot
+	t = int(hh+mm)/5
+	t = int(t)
+	return t
+
+class JobTable(object):
+	'''Compact, read-only description of a set of jobs and existing events.
+
+	Per-code arrays (length n_codes, including the empty slot on the end):
+	ids, active
+
+	Per-task arrays (length n_tasks, job tasks only):
+	job, exp, index  - where the task is, as in its ID string
+	time             - number of slots it takes
+	flexible         - whether it can be moved independently of the rest of its experiment
+	next, prev       - the code of the following/preceding task in the job, or NONE
+	exp_first        - code of the first task in the same experiment
+	exp_length       - number of tasks in the same experiment
+
+	Per-job arrays:
+	job_first        - code of task 0 of experiment 0 in each job
+	'''
+
+def compile_jobs(jobs, existing_jobs):
+	'''Builds a JobTable from the output of read_job_file, and a list of existing events'''
+	table = JobTable()
+
+	ids = []
+	job, exp, index, time, flexible, active = [], [], [], [], [], []
+	exp_first, exp_length = [], []
+	job_first = []
+	for job_index, job_dict in enumerate(jobs):
+		job_first.append(len(ids))
+		for exp_index, exp_name in enumerate(job_dict['order']):
+			experiment = job_dict[exp_name]
+			first = len(ids)
+			for tas_index, task in enumerate(experiment):
+				ids.append('%02d%02d%02d' % (job_index, exp_index, tas_index))
+				job.append(job_index)
+				exp.append(exp_index)
+				index.append(tas_index)
+				time.append(task['time'])
+				flexible.append(task['flexible'])
+				active.append(int(task['active']))
+				exp_first.append(first)
+				exp_length.append(len(experiment))
+
+	n_tasks = len(ids)
+
+	# Codes are contiguous within a job, so the next task is always the next code, as long as it's in the same
+	# experiment or the one straight after. If the following experiment is empty, the job ends there, as it does
+	# with incriment_ID. Going backwards, an empty experiment in the way means there is no previous task.
+	next_code, prev_code = [], []
+	for code in range(n_tasks):
+		following = code+1
+		if following < n_tasks and job[following] == job[code] and exp[following] - exp[code] in (0, 1):
+			next_code.append(following)
+		else:
+			next_code.append(NONE)
+
+		preceding = code-1
+		if preceding >= 0 and job[preceding] == job[code] and exp[code] - exp[preceding] in (0, 1):
+			prev_code.append(preceding)
+		else:
+			prev_code.append(NONE)
+
+	for j, task in enumerate(existing_jobs):
+		ids.append('99'+str(j).rjust(4, '0'))
+		active.append(int(task['active']))
+
+	# Conflicts and night times are always active, and the empty slot never is
+	ids += ['999998', '999999', '']
+	active += [1, 1, 0]
+
+	codes = dict((ID, code) for code, ID in enumerate(ids))
+
+	table.n_jobs  = len(jobs)
+	table.n_tasks = n_tasks
+	table.n_codes = len(ids)
+
+	table.ids   = ids
+	table.codes = codes
+
+	table.first_event   = n_tasks
+	table.conflict_code = codes['999998']
+	table.night_code    = codes['999999']
+
+	table.active = np.array(active, dtype=np.int16)
+
+	table.job        = np.array(job, dtype=np.int32)
+	table.exp        = np.array(exp, dtype=np.int32)
+	table.index      = np.array(index, dtype=np.int32)
+	table.time       = np.array(time, dtype=np.int32)
+	table.flexible   = np.array(flexible, dtype=np.int8)
+	table.next       = np.array(next_code, dtype=np.int32)
+	table.prev       = np.array(prev_code, dtype=np.int32)
+	table.exp_first  = np.array(exp_first, dtype=np.int32)
+	table.exp_length = np.array(exp_length, dtype=np.int32)
+
+	table.job_first = np.array(job_first, dtype=np.int32)
+
+	table.n_genes = count_genes(jobs)
+
+	return table
+
+def gene_dtype(n_jobs):
+	'''The smallest integer type that can hold a gene'''
+	return np.uint8 if n_jobs <= 256 else np.uint16
+
+def count_genes(jobs):
+	'''How many genes a chromosome needs. Flexible experiments need one per task, inflexible ones need one.'''
+	n_genes = 0
+	for job in jobs:
+		for experiment_name in job['order']:
+			if not job[experiment_name]:
+				continue
+			if job[experiment_name][0]['flexible']:
+				n_genes += len(job[experiment_name])
+			else:
+				n_genes += 1
+	return n_genes
+
+def count_chromosomes(n_jobs, n_genes):
+	'''How many different chromosomes there are, written out for printing, e.g. 2.19e+16. It soon gets far too big
+	for a float, so it's worked out as a power of ten.'''
+	if n_jobs < 2 or not n_genes:
+		return '1'
+	power = n_genes * math.log10(n_jobs)
+	exponent = int(power)
+	mantissa = 10**(power - exponent)
+	if mantissa >= 9.995:
+		mantissa, exponent = 1., exponent + 1
+	return '%.3ge+%02d' % (mantissa, exponent)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Local search over chromosomes, as an alternative to the genetic algorithm. Both searches start from one
+chromosome and keep making small changes to it:
+- a gene move changes one gene to a different job
+- a swap move swaps two genes that point at different jobs
+
+anneal  - simulated annealing. Tries one random move at a time, always keeping it if it's no worse, and sometimes
+          keeping it even if it is, less and less often as the temperature falls.
+tabu    - tabu search. Tries a handful of random moves at once and takes the best of them, even if it's worse,
+          but isn't allowed to undo a recent move unless that gives a new best.
+
+Chromosomes are scored by the same evaluators as optimise uses, so repeats come from the cache, and the stopping
+rules in GAConfig apply, counting every n_individuals scores as a generation. The threshold rule is ignored, as
+there's no population to measure the spread of.
+'''
+
+import math
+
+import numpy as np
+
+import bounds
+import evaluator
+import ga_config
+import genetic_scheduler as gs
+import job_table
+
+# Fraction of moves that are swaps, rather than gene moves
+SWAP_RATE = 0.5
+
+# Starting temperature for annealing, as a fraction of the starting score, and how much it falls after each move
+TEMPERATURE = 0.01
+COOLING     = 0.999
+
+# How many moves a position stays tabu for, at least
+TABU_TENURE = 5
+
+def random_moves(individual, n_jobs, n_moves, rng, swap_rate=SWAP_RATE):
+	'''Picks n_moves random moves from individual. Each is ('gene', position, new job) or ('swap', position, other
+	position).'''
+	n_tasks = len(individual)
+	swaps     = rng.random(n_moves) < swap_rate
+	positions = rng.integers(0, n_tasks, n_moves)
+	others    = rng.integers(0, n_tasks, n_moves)
+
+	# Pick from every job but the current one
+	values = rng.integers(0, n_jobs-1, n_moves)
+	values += values >= individual[positions]
+
+	moves = []
+	for swap, position, other, value in zip(swaps.tolist(), positions.tolist(), others.tolist(), values.tolist()):
+		# Swapping two genes for the same job wouldn't change anything
+		if swap and individual[position] != individual[other]:
+			moves.append(('swap', position, other))
+		else:
+			moves.append(('gene', position, value))
+	return moves
+
+def apply_move(individual, move):
+	'''Returns a copy of individual with the move made'''
+	kind, position, x = move
+	child = individual.copy()
+	if kind == 'swap':
+		child[position], child[x] = individual[x], individual[position]
+	else:
+		child[position] = x
+	return child
+
+def changed(move):
+	'''The positions a move changes'''
+	kind, position, x = move
+	if kind == 'swap':
+		return (position, x)
+	return (position,)
+
+class LocalSearch(object):
+	'''What anneal and tabu have in common: the evaluator, the best so far, and the stopping rules'''
+
+	def __init__(self, jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours, n_workers, seed,
+		debug, config, start):
+		if config == None:
+			config = ga_config.GAConfig()
+		self.config = config
+		self.work_hours = work_hours
+		self.debug = debug
+
+		self.rng = np.random.default_rng(seed)
+		self.n_jobs = len(jobs)
+		n_tasks = job_table.count_genes(jobs)
+
+		self.evaluator = evaluator.make_evaluator(
+			jobs, existing_jobs, initial_date, workday_start, workday_end, n_workers,
+			checkpoint_bytes=config.checkpoint_bytes)
+
+		if start is None:
+			start = gs.random_cohort(self.n_jobs, n_tasks, 1, self.rng)[0]
+		self.start = np.asarray(start).astype(job_table.gene_dtype(self.n_jobs))
+
+		self.best_score, self.best_individual = None, None
+		self.last_improvement = 0
+		self.generation = 0
+		self.history = {'best_scores': [], 'evaluations': 0}
+		self.progress = bounds.SearchProgress(
+			jobs, existing_jobs, initial_date, workday_start, workday_end, self.history, debug)
+
+	def score(self, individuals):
+		'''Scores some individuals, with infinity for any that had to skip tasks'''
+		results = self.evaluator.evaluate(individuals, self.work_hours)
+		self.history['evaluations'] += len(individuals)
+
+		scores = []
+		for individual, (fitness, skipped_tasks) in zip(individuals, results):
+			if skipped_tasks:
+				fitness = float('inf')
+			elif self.best_score == None or fitness < self.best_score:
+				self.best_score, self.best_individual = fitness, individual.copy()
+				self.last_improvement = self.history['evaluations']
+			scores.append(fitness)
+		return scores
+
+	def stop_reason(self):
+		'''Records the best score and checks the stopping rules, once per generation's worth of scores'''
+		evaluations = self.history['evaluations']
+		n_individuals = self.config.n_individuals
+		if evaluations // n_individuals <= self.generation:
+			return None
+		self.generation = evaluations // n_individuals
+
+		best_score = self.best_score if self.best_score != None else float('inf')
+		self.history['best_scores'].append(best_score)
+		gap = self.progress.record_gap(self.best_score)
+		if self.debug:
+			print('      %3d   - %4s - %.1lf%%' % (self.generation, best_score, 100*gap))
+
+		stale = (evaluations - self.last_improvement) // n_individuals
+		return self.progress.stop_reason(self.config, self.generation, stale, float('inf'), self.best_score)
+
+	def finish(self, reason):
+		self.evaluator.close()
+
+		self.history['generations'] = self.generation
+		self.progress.finish()
+
+		if self.debug:
+			if reason != None:
+				print(reason)
+			if self.best_individual is None:
+				print("I couldn't find a solution to this set of jobs.")
+			else:
+				print('The best individual was %s' % ''.join([str(x) for x in self.best_individual]))
+
+		return self.best_individual, self.history
+
+def anneal(jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours=2*24, n_workers=1, seed=None,
+	debug=0, config=None, start=None, temperature=TEMPERATURE, cooling=COOLING, swap_rate=SWAP_RATE):
+	'''Simulated annealing from start (a random chromosome if None). The temperature starts at temperature times
+	the starting score, and is multiplied by cooling after every move.
+	returns:
+	best_individual, history
+	just like optimise.'''
+	search = LocalSearch(jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours, n_workers, seed,
+		debug, config, start)
+	rng = search.rng
+
+	current = search.start
+	current_score = search.score([current])[0]
+	t = temperature * current_score if current_score != float('inf') else None
+
+	if debug:
+		print('Annealing from a score of %s' % current_score)
+		print('Generation  - Best - gap')
+
+	reason = None
+	while reason == None and search.n_jobs > 1:
+		move = random_moves(current, search.n_jobs, 1, rng, swap_rate)[0]
+		child = apply_move(current, move)
+		score = search.score([child])[0]
+
+		# The temperature is set by the first score that fits
+		if t == None and score != float('inf'):
+			t = temperature * score
+
+		# Wander about at random until something fits
+		if current_score == float('inf'):
+			current, current_score = child, score
+		else:
+			delta = score - current_score
+			if delta <= 0 or (score != float('inf') and rng.random() < math.exp(-delta / t)):
+				current, current_score = child, score
+
+		if t:
+			t *= cooling
+
+		reason = search.stop_reason()
+
+	return search.finish(reason)
+
+def tabu(jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours=2*24, n_workers=1, seed=None,
+	debug=0, config=None, start=None, tenure=None, swap_rate=SWAP_RATE):
+	'''Tabu search from start (a random chromosome if None). Each step tries config.n_individuals random moves, all
+	scored together so they can be spread over the workers, and takes the best one that isn't tabu. After a move,
+	the genes it replaced can't be put back for tenure steps (by default a tenth of the genes, but at least
+	TABU_TENURE), unless that would give a new best.
+	returns:
+	best_individual, history
+	just like optimise.'''
+	search = LocalSearch(jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours, n_workers, seed,
+		debug, config, start)
+	rng = search.rng
+	n_moves = search.config.n_individuals
+
+	current = search.start
+	if tenure == None:
+		tenure = max(TABU_TENURE, len(current)//10)
+
+	# (position, job) -> the step until which that gene can't come back
+	tabu_until = {}
+
+	current_score = search.score([current])[0]
+	if debug:
+		print('Tabu search from a score of %s' % current_score)
+		print('Generation  - Best - gap')
+
+	step = 0
+	reason = None
+	while reason == None and search.n_jobs > 1:
+		step += 1
+		moves = random_moves(current, search.n_jobs, n_moves, rng, swap_rate)
+		children = np.array([apply_move(current, move) for move in moves])
+		best_before = search.best_score
+		scores = search.score(children)
+
+		chosen = None
+		for x in np.argsort(scores, kind='stable').tolist():
+			is_tabu = any(tabu_until.get((position, int(children[x][position])), 0) > step
+				for position in changed(moves[x]))
+			new_best = best_before == None or scores[x] < best_before
+			if not is_tabu or new_best:
+				chosen = x
+				break
+
+		if chosen != None:
+			for position in changed(moves[chosen]):
+				tabu_until[(position, int(current[position]))] = step + tenure
+			current, current_score = children[chosen], scores[chosen]
+
+		reason = search.stop_reason()
+
+	return search.finish(reason)
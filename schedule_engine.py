@@ -0,0 +1,510 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+A faster decoder for the genetic scheduler.
+
+genetic_scheduler.generate_schedule keeps the schedule as lists of 'XXYYZZ' ID strings, and every time it tries a
+slot it has to look up every ID in that slot to find out if anything is active. That is where nearly all of the
+time goes. This engine keeps the same information as integer NumPy arrays instead:
+
+ - grid[job, slot]  is the integer code of the task in that slot (EMPTY if nothing is there). The last row is the
+                    blocking row, holding nights, weekends and existing events, exactly like job_schedules[-1].
+ - active[slot]     is how many active tasks are in that slot.
+
+so checking whether a task fits at some slot is just one vectorised comparison over the window it would occupy.
+The placement rules are copied from generate_schedule, so a given permutation produces exactly the same schedule,
+except that the schedule grows a day at a time when a task doesn't fit, rather than skipping the task.
+'''
+
+import numpy as np
+
+import job_table
+from job_table import EMPTY, NONE
+
+# How many starting slots to test at once when sliding a task down the schedule. Most tasks fit near where they
+# start looking, so start small and double up each time round.
+FIRST_CHUNK = 32
+
+def active_runs(block_active):
+	'''Returns the offsets and lengths of the runs of active slots in a block'''
+	edges = np.diff(np.concatenate(([0], block_active > 0, [0])).astype(np.int8))
+	offsets = np.flatnonzero(edges == 1)
+	lengths = np.flatnonzero(edges == -1) - offsets
+	return offsets, lengths
+
+def runs(values):
+	'''Returns the offsets, lengths and values of the runs of equal values in an array'''
+	if not len(values):
+		return [], [], []
+	edges = np.flatnonzero(np.diff(values)) + 1
+	offsets = np.concatenate(([0], edges))
+	lengths = np.diff(np.concatenate((offsets, [len(values)])))
+	return offsets.tolist(), lengths.tolist(), values[offsets].tolist()
+
+class Footprint(object):
+	'''Everything about a task's block that placing it needs, worked out once when the jobs are loaded rather than
+	every time the block is placed.
+
+	block        - the codes it writes into the schedule (see GridEngine.task_block)
+	active       - how active each of those slots is
+	length       - how many slots it takes
+	next_task    - which task is next in its job afterwards
+	runs         - the (offset, length, code) runs of each task in it, leaving out empty slots
+	active_runs  - the (offset, length) runs of active slots in it
+	task_stop    - how far past the start of the block each task in it stops
+	end          - how far past the start of the block its last task stops. An inflexible experiment can have
+	               empty slots on the end, if its tasks run out before its timings do.
+	'''
+
+	def __init__(self, block, next_task, task_active):
+		self.block  = block
+		self.active = task_active[block]
+		self.block.flags.writeable  = False
+		self.active.flags.writeable = False
+
+		self.length    = len(block)
+		self.next_task = next_task
+		self.runs      = [run for run in zip(*runs(block)) if run[2] != EMPTY]
+
+		offsets, lengths = active_runs(self.active)
+		self.active_runs = list(zip(offsets.tolist(), lengths.tolist()))
+
+		self.task_stop = dict((code, offset+length) for offset, length, code in self.runs)
+		self.end = max(self.task_stop.values()) if self.runs else 0
+
+def first_fit(active, footprint, start, stop):
+	'''Returns the first slot in range(start, stop) where the block can go without two active tasks overlapping,
+	or None if there isn't one.
+
+	Nothing ever gets placed on top of an active slot, so a slot is never more than 1 active. The block fits at i
+	as long as each of its runs of active slots lands on a stretch with no active slots at all, which a prefix sum
+	of the busy slots can check for every starting slot at once. That makes this linear in the number of slots
+	searched, however long the block is.'''
+	if start >= stop:
+		return None
+
+	if not footprint.active_runs:
+		# Nothing active, so it goes wherever it starts looking
+		return start
+
+	block_length = footprint.length
+	chunk = FIRST_CHUNK
+	while start < stop:
+		end = min(start+chunk, stop)
+		n = end - start
+
+		# busy_before[k] is the number of busy slots in active[start:start+k]
+		busy = active[start:end+block_length-1] > 0
+		busy_before = np.zeros(len(busy)+1, dtype=np.int32)
+		np.cumsum(busy, out=busy_before[1:])
+
+		fits = np.ones(n, dtype=bool)
+		for offset, length in footprint.active_runs:
+			fits &= busy_before[offset+length:offset+length+n] == busy_before[offset:offset+n]
+
+		if fits.any():
+			return start + int(fits.argmax())
+		start = end
+		chunk *= 2
+	return None
+
+class Checkpoint(object):
+	'''A frozen copy of the decoder's state, after the first perm_index genes of some permutation have been used.
+	The arrays are read-only, and only get copied again when a decode actually restarts from here.'''
+
+	def __init__(self, grid, active, current_tasks, frontier, skipped_tasks, perm_index, end):
+		self.grid   = grid.copy()
+		self.active = active.copy()
+		self.grid.flags.writeable   = False
+		self.active.flags.writeable = False
+
+		self.current_tasks = tuple(current_tasks)
+		self.frontier      = tuple(frontier)
+		self.skipped_tasks = tuple(skipped_tasks)
+		self.perm_index    = perm_index
+		self.end           = end
+
+		self.n_slots = grid.shape[1]
+		self.nbytes  = self.grid.nbytes + self.active.nbytes
+
+	def restore(self):
+		'''Returns fresh, writeable copies of the state, ready to carry on decoding'''
+		return (self.grid.copy(), self.active.copy(), list(self.current_tasks), list(self.frontier),
+			list(self.skipped_tasks), self.perm_index, self.end)
+
+class GridEngine(object):
+	'''Holds everything about the jobs and the calendar that doesn't change between chromosomes, and decodes
+	chromosomes into schedules using integer arrays.'''
+
+	def __init__(self, jobs, existing_jobs, initial_date, workday_start, workday_end):
+		self.jobs          = jobs
+		self.existing_jobs = existing_jobs
+		self.initial_date  = initial_date
+		self.workday_start = workday_start
+		self.workday_end   = workday_end
+
+		self.n_jobs = len(jobs)
+
+		self.table = job_table.compile_jobs(jobs, existing_jobs)
+
+		# The decoder reads these one element at a time, which is much quicker from a list than from an array
+		table = self.table
+		self._time       = table.time.tolist()
+		self._job        = table.job.tolist()
+		self._flexible   = table.flexible.tolist()
+		self._next       = table.next.tolist()
+		self._prev       = table.prev.tolist()
+		self._exp_first  = table.exp_first.tolist()
+		self._exp_length = table.exp_length.tolist()
+
+		# What each task's block puts in the schedule
+		self.footprints = [Footprint(block, next_task, table.active)
+			for block, next_task in map(self.task_block, range(table.n_tasks))]
+
+		# Which task each job moves on to after placing a task, and so how many genes each job uses up. That
+		# doesn't depend on the order the jobs are placed in.
+		self._advance = [footprint.next_task for footprint in self.footprints]
+		self.job_genes = []
+		for code in table.job_first.tolist():
+			n_genes = 0
+			while code != NONE:
+				n_genes += 1
+				code = self._advance[code]
+			self.job_genes.append(n_genes)
+
+		# How far past the start of a task's block its last task ends
+		self._block_end = [footprint.end for footprint in self.footprints]
+
+		# For the cutoff: _next_offset is how far past the start of a task's block the job's next task can start at
+		# the earliest (0 if we can't tell), and _tail is how far past the start of the block the job can finish at
+		# the earliest. The next task starts after the last slot of the task before it, and if that's in this block,
+		# we know where. Codes only ever move on to higher codes, so go backwards.
+		self._next_offset = [0] * table.n_tasks
+		self._tail = [0] * table.n_tasks
+		for code in reversed(range(table.n_tasks)):
+			footprint = self.footprints[code]
+			next_task = footprint.next_task
+			tail = footprint.end
+			if next_task != NONE and self._prev[next_task] in footprint.task_stop:
+				self._next_offset[code] = footprint.task_stop[self._prev[next_task]]
+				tail = max(tail, self._next_offset[code] + self._tail[next_task])
+			self._tail[code] = tail
+
+		# Each job keeps a frontier, the first slot its next task can start at: the slot after the last one of the
+		# task before it. When a block goes in, that task is usually in it, at _frontier_offset past the start (0
+		# if it isn't). That's only safe if no other block the job places has the same task in it, which can happen
+		# with a mix of flexible and inflexible tasks, so then the frontier is found by looking through the grid.
+		placed = [0] * table.n_tasks
+		for code in table.job_first.tolist():
+			while code != NONE:
+				for task in self.footprints[code].task_stop:
+					placed[task] += 1
+				code = self._advance[code]
+		self._frontier_offset = [offset if offset and placed[self._prev[footprint.next_task]] == 1 else 0
+			for offset, footprint in zip(self._next_offset, self.footprints)]
+
+		# Canonical chromosomes are stored as bytes, as small as the number of jobs allows
+		self._gene_dtype = job_table.gene_dtype(self.n_jobs)
+
+		# Each existing event blocks out the slots from _event_start up to _event_stop
+		first_slot = np.array([task['first_slot'] for task in existing_jobs], dtype=np.int64)
+		time       = np.array([int(task['time']) for task in existing_jobs], dtype=np.int64)
+		self._event_start = first_slot - 1
+		self._event_stop  = first_slot + time + 1
+		self._event_code  = table.first_event + np.arange(len(existing_jobs), dtype=np.int64)
+
+		# After the last existing event, the calendar just repeats itself every week
+		self.day_length  = job_table.get_5_min_time(24,00)
+		self.week_length = 7*self.day_length
+		self.events_end  = int(max(self._event_stop.max(), 0)) if len(existing_jobs) else 0
+
+		# The calendar template, and the empty schedules built from it, are filled in as they're needed
+		self._template_row    = np.zeros(0, dtype=np.int32)
+		self._template_active = np.zeros(0, dtype=np.int16)
+		self._empty_days = {}
+
+	def initialise_day(self, work_hours):
+		'''Array version of genetic_scheduler.initialise_day. Returns the grid, and the number of active tasks in
+		each slot.
+
+		The empty schedule only depends on the calendar, so it's built once for each length and kept read-only.
+		Each decode just starts from a copy of it.'''
+		n_slots = job_table.get_5_min_time(work_hours)
+
+		if n_slots not in self._empty_days:
+			row, row_active = self.template(0, n_slots)
+
+			grid = np.full((self.n_jobs+1, n_slots), EMPTY, dtype=np.int32)
+			grid[-1] = row
+			active = row_active.copy()
+
+			grid.flags.writeable   = False
+			active.flags.writeable = False
+			self._empty_days[n_slots] = (grid, active)
+
+		grid, active = self._empty_days[n_slots]
+		return grid.copy(), active.copy()
+
+	def grow(self, grid, active):
+		'''Adds another day onto the end of a schedule, and returns the longer grid and active counts'''
+		n_slots = grid.shape[1]
+		row, row_active = self.template(n_slots, n_slots+self.day_length)
+
+		extra = np.full((self.n_jobs+1, self.day_length), EMPTY, dtype=np.int32)
+		extra[-1] = row
+
+		grid   = np.concatenate((grid, extra), axis=1)
+		active = np.concatenate((active, row_active))
+		return grid, active
+
+	def template(self, start, stop):
+		'''Returns the blocking row from slot start up to stop, and how active each of those slots is. These are
+		read-only views of a row that is worked out once, and extended a week at a time when something asks for
+		more of it.'''
+		n_slots = len(self._template_row)
+		if stop > n_slots:
+			new_stop = max(stop, n_slots + self.week_length)
+			row = np.concatenate((self._template_row, self.blocking_row(n_slots, new_stop)))
+			row_active = self.table.active[row]
+
+			row.flags.writeable        = False
+			row_active.flags.writeable = False
+			self._template_row    = row
+			self._template_active = row_active
+
+		return self._template_row[start:stop], self._template_active[start:stop]
+
+	def blocking_row(self, start, stop):
+		'''Works out the blocking row of the schedule, from slot start up to (not including) stop.
+
+		Existing events are padded by a slot either side, and any slot with more than one event in it is marked as
+		conflicting. Nights and weekends then overwrite everything else. This is what initialise_day does, except
+		that events that start before the schedule are cut off at slot 0, rather than wrapping round to the end of
+		the list, so the row comes out the same however long the schedule is.'''
+		table = self.table
+		n_slots = stop - start
+
+		# Count how many events cover each slot, and add up their codes, using the places where they start and stop
+		first = np.clip(self._event_start - start, 0, n_slots)
+		last  = np.clip(self._event_stop  - start, 0, n_slots)
+		keep  = first < last
+
+		n_events = np.zeros(n_slots+1, dtype=np.int32)
+		np.add.at(n_events, first[keep],  1)
+		np.add.at(n_events, last[keep],  -1)
+
+		code_sum = np.zeros(n_slots+1, dtype=np.int64)
+		np.add.at(code_sum, first[keep],  self._event_code[keep])
+		np.add.at(code_sum, last[keep],  -self._event_code[keep])
+
+		n_events = np.cumsum(n_events[:-1])
+		code_sum = np.cumsum(code_sum[:-1])
+
+		row = np.where(n_events == 1, code_sum, EMPTY)
+		row[n_events > 1] = table.conflict_code
+
+		# Block out nights and weekends
+		slots = np.arange(start, stop)
+		time  = slots % self.day_length
+		day   = (slots // self.day_length) + self.initial_date.isoweekday() -1
+
+		night = (time < self.workday_start) | (time >= self.workday_end) | (day%7 == 5) | (day%7 == 6)
+		row[night] = table.night_code
+
+		return row.astype(np.int32)
+
+	def task_block(self, starter):
+		'''Works out what a task occupies when it is placed: the codes it writes into the schedule, and which task
+		is next in its job afterwards. A flexible task is placed on its own. An inflexible one brings the whole
+		experiment with it, as a single block. This is only done once for each task, for its Footprint.'''
+		if self._flexible[starter]:
+			block = np.full(self._time[starter], starter, dtype=np.int32)
+			return block, self._next[starter]
+
+		exp_first = self._exp_first[starter]
+		exp_last  = exp_first + self._exp_length[starter]
+
+		# The block has the timings of the experiment's tasks, labelled by following the links on from the
+		# starting task
+		code = starter
+		block_codes = []
+		for time in self._time[exp_first:exp_last]:
+			block_codes.append(code if time else EMPTY)
+			if code != NONE:
+				code = self._next[code]
+		block = np.repeat(np.array(block_codes, dtype=np.int32), self.table.time[exp_first:exp_last])
+
+		# generate_schedule decides how to move on using the last task of the experiment
+		if self._flexible[exp_last-1]:
+			code = self._next[starter]
+
+		return block, code
+
+	def generate_schedule(self, permutation, work_hours=7*24, cutoff=None):
+		'''Generates a schedule from a given permutation, in the same way as genetic_scheduler.generate_schedule.
+		If cutoff is set, the grid is None if the permutation was given up on for scoring worse than that.
+		returns:
+		grid, skipped_tasks'''
+		grid, skipped_tasks, checkpoints, end = self.decode(permutation, work_hours, cutoff=cutoff)
+		return grid, skipped_tasks
+
+	def decode(self, permutation, work_hours=7*24, checkpoint=None, checkpoint_every=0, cutoff=None, n_genes=None):
+		'''Does the work for generate_schedule. Decoding can pick up from a checkpoint taken while decoding another
+		permutation, as long as the two permutations agree up to that point. If checkpoint_every is set, a
+		checkpoint is saved each time that many more genes have been used.
+
+		work_hours is only where the schedule starts out. Whenever a task runs off the end, another day is added
+		and the search carries on, so tasks are only skipped if they can never fit anywhere.
+
+		The makespan, end, is the slot after the last task finishes. It's kept up to date as each task goes in, and
+		is what the schedule is scored by.
+
+		If cutoff is set, decoding stops as soon as the makespan can't possibly be cutoff or less, and the grid
+		comes back as None. Every job still has to finish, which can be no earlier than its last placed task, plus
+		the rest of its tasks end to end (see _tail), so that's checked after each task goes in.
+
+		If n_genes is set, decoding stops once that many genes have been used (so permutation only needs to be that
+		long), and the last checkpoint is the state it got to.
+		returns:
+		grid, skipped_tasks, checkpoints, end'''
+		task_active = self.table.active
+		footprints  = self.footprints
+		n_jobs = self.n_jobs
+		# Plain ints are much quicker to index lists with than numpy's
+		permutation = np.asarray(permutation).tolist()
+
+		if checkpoint == None:
+			grid, active = self.initialise_day(work_hours)
+			current_tasks = self.table.job_first.tolist()
+			# The first task of each job has nothing before it
+			frontier = [1] * n_jobs
+			skipped_tasks = []
+			perm_index = 0
+			# The slot after the last one we've put a task in
+			end = 0
+		else:
+			grid, active, current_tasks, frontier, skipped_tasks, perm_index, end = checkpoint.restore()
+		n_slots = grid.shape[1]
+		n_finished = current_tasks.count(NONE)
+
+		if cutoff != None:
+			# The least the makespan can come to, given what's been placed so far
+			min_end = max([end] + [self.earliest_end(start, code)
+				for start, code in zip(frontier, current_tasks) if code != NONE])
+
+		checkpoints = []
+		resumed_at = perm_index
+		while n_finished != n_jobs and perm_index != n_genes:
+			if cutoff != None and min_end > cutoff:
+				return None, skipped_tasks, checkpoints, end
+
+			if checkpoint_every and perm_index % checkpoint_every == 0 and perm_index != resumed_at:
+				checkpoints.append(Checkpoint(grid, active, current_tasks, frontier, skipped_tasks, perm_index, end))
+
+			# Start off with the ideal next task, and go to the next job if that one is finished
+			job_index = permutation[perm_index]
+			while current_tasks[job_index] == NONE:
+				job_index = (job_index + 1) % n_jobs
+			perm_index += 1
+
+			starter = current_tasks[job_index]
+			footprint = footprints[starter]
+			next_task = footprint.next_task
+			block_length = footprint.length
+
+			# The slot after the last one of the previous task in this job
+			start = frontier[job_index]
+
+			# Slide the block down the schedule until none of its active slots land on an active slot
+			stop = n_slots-block_length
+			i = first_fit(active, footprint, start, stop)
+
+			# If it doesn't fit, add days until it does. Past the last event and the last task, the schedule
+			# repeats every week, so if we've tried a whole week of starting slots past there it never will.
+			quiet_from = max(start, self.events_end, end)
+			while i == None and stop < quiet_from + self.week_length:
+				grid, active = self.grow(grid, active)
+				n_slots = grid.shape[1]
+				i = first_fit(active, footprint, max(start, stop), n_slots-block_length)
+				stop = n_slots-block_length
+
+			if i == None:
+				skipped_tasks.append(self.table.ids[starter])
+			else:
+				window = slice(i, i+block_length)
+				# Anything we overwrite stops counting towards the active slots
+				active[window] -= task_active[grid[job_index, window]]
+				active[window] += footprint.active
+				grid[job_index, window] = footprint.block
+				if footprint.end:
+					end = max(end, i+footprint.end)
+
+			# Now, move this job on to its next task.
+			current_tasks[job_index] = next_task
+			if next_task == NONE:
+				n_finished += 1
+			elif i != None and self._frontier_offset[starter]:
+				frontier[job_index] = i + self._frontier_offset[starter]
+			else:
+				frontier[job_index] = self.find_frontier(grid, job_index, next_task)
+
+			if cutoff != None:
+				min_end = max(min_end, end)
+				if next_task != NONE:
+					min_end = max(min_end, self.earliest_end(frontier[job_index], next_task))
+
+		if n_genes != None:
+			checkpoints.append(Checkpoint(grid, active, current_tasks, frontier, skipped_tasks, perm_index, end))
+
+		return grid, skipped_tasks, checkpoints, end
+
+	def evaluate(self, permutation, work_hours=7*24, cutoff=None):
+		'''Scores a permutation. The fitness is the makespan of its schedule, the slot after the last task ends,
+		so smaller is better. If cutoff is set, the fitness is None for permutations that were given up on for
+		scoring worse than that.
+		returns:
+		fitness, skipped_tasks'''
+		grid, skipped_tasks, checkpoints, end = self.decode(permutation, work_hours, cutoff=cutoff)
+		if grid is None:
+			return None, skipped_tasks
+		return end, skipped_tasks
+
+	def find_frontier(self, grid, job_index, code):
+		'''Looks through a job's row of the grid for the slot after the last one of the task before code, which is
+		where code can start. This is the slow way, for when decode can't tell from the block it just placed.'''
+		prev_task = self._prev[code]
+		if prev_task != NONE:
+			where = np.flatnonzero(grid[job_index] == prev_task)
+			if len(where):
+				return int(where[-1]) + 1
+		return 1
+
+	def earliest_end(self, start, code):
+		'''The earliest a job can finish, when its next task to place is code, which can't start before start'''
+		return start + self._tail[code]
+
+	def canonical(self, permutation):
+		'''Returns the genes that a permutation actually uses, as bytes. Any gene that points at a job that has
+		already finished is replaced by the job that gets placed instead, and genes after the last job finishes
+		are dropped. Two permutations with the same canonical form always give the same schedule.'''
+		remaining = list(self.job_genes)
+		n_left = sum(remaining)
+		n_jobs = self.n_jobs
+
+		used = []
+		for job_index in np.asarray(permutation).tolist():
+			if not n_left:
+				break
+			while not remaining[job_index]:
+				job_index = (job_index + 1) % n_jobs
+			remaining[job_index] -= 1
+			n_left -= 1
+			used.append(job_index)
+
+		return np.array(used, dtype=self._gene_dtype).tobytes()
+
+	def job_schedules(self, grid):
+		'''Converts a grid back to the lists of ID strings that genetic_scheduler uses'''
+		ids = self.table.ids
+		return [[ids[code] for code in row] for row in grid.tolist()]
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+A steady-state genetic algorithm, so the workers never sit idle waiting for the slowest chromosome in a generation.
+
+Each worker process always has a couple of chromosomes queued up. As soon as any score comes back, the chromosome
+joins the population if it beats the worst one there, and a new child is bred from the population as it stands and
+sent off in its place. There are no generations as such, but the stopping rules in GAConfig count every
+n_individuals scores as one.
+
+Chromosomes that have been scored before are looked up in a FitnessCache rather than sent to a worker.
+
+The order the scores come back in depends on how long each one takes, so unlike optimise, a seeded run won't always
+give exactly the same result.
+'''
+
+import bisect
+import os
+from concurrent.futures import wait, FIRST_COMPLETED
+
+import numpy as np
+
+import bounds
+import dispatch_rules
+import evaluator
+import ga_config
+import genetic_scheduler as gs
+import job_table
+import schedule_engine
+
+# How many chromosomes to keep queued up for each worker
+IN_FLIGHT = 2
+
+def run_steady_state(jobs, existing_jobs, initial_date, workday_start, workday_end, work_hours=2*24, n_workers=None,
+	seed=None, debug=0, config=None, in_flight=IN_FLIGHT):
+	'''Runs a steady-state genetic algorithm on n_workers processes (None for one per core), with a population the
+	size given in config. Parents are picked from the better half of the population, and bred with the same
+	crossover and mutation as optimise.
+	returns:
+	best_individual, history
+	just like optimise, plus history['evaluations_per_second'].'''
+	if config == None:
+		config = ga_config.GAConfig()
+	if n_workers == None:
+		n_workers = os.cpu_count()
+
+	rng = np.random.default_rng(seed)
+	n_jobs  = len(jobs)
+	n_tasks = job_table.count_genes(jobs)
+	n_individuals = config.n_individuals
+
+	engine = schedule_engine.GridEngine(jobs, existing_jobs, initial_date, workday_start, workday_end)
+	cache  = evaluator.FitnessCache()
+	pool   = evaluator.PoolEvaluator(
+		jobs, existing_jobs, initial_date, workday_start, workday_end, n_workers, config.checkpoint_bytes)
+
+	# The population, kept sorted best first
+	scores = []
+	population = []
+
+	# The first n_individuals are random, to get things going
+	newcomers = gs.random_cohort(n_jobs, n_tasks, n_individuals, rng)
+	if config.seed_rules:
+		dispatch_rules.seed_cohort(newcomers, engine)
+	newcomers = list(newcomers)
+
+	best_scores = []
+	spreads = []
+	history = {'best_scores': best_scores, 'spreads': spreads, 'evaluations': 0}
+	best_score, best_individual = None, None
+
+	# Every score that comes back counts, whether it came from a worker or the cache
+	n_scored = 0
+	last_improvement = 0
+
+	def next_child():
+		if newcomers:
+			return newcomers.pop(0)
+		if len(population) < 2:
+			return gs.random_cohort(n_jobs, n_tasks, 1, rng)[0]
+		# Mum and dad both come from the better half
+		half = len(population)//2
+		mum, dad = rng.integers(0, half, 2, endpoint=True)
+		child = gs.crossover(n_jobs, config, population[mum][None], population[dad][None], rng)
+		return child[0].astype(population[0].dtype)
+
+	def add(individual, fitness, skipped_tasks):
+		nonlocal n_scored, best_score, best_individual, last_improvement
+		n_scored += 1
+		if skipped_tasks:
+			if debug > 1:
+				print('This guy had to skip some tasks, which will never fit: %s' % ', '.join(skipped_tasks))
+			return
+		# Given up on for being no better than the worst of the population when it was sent off
+		if fitness == None:
+			return
+		if len(population) < n_individuals:
+			x = bisect.bisect_right(scores, fitness)
+		elif fitness < scores[-1]:
+			# Out with the worst
+			scores.pop()
+			population.pop()
+			x = bisect.bisect_right(scores, fitness)
+		else:
+			return
+		scores.insert(x, fitness)
+		population.insert(x, individual)
+
+		if best_score == None or fitness < best_score:
+			best_score, best_individual = fitness, individual.copy()
+			last_improvement = n_scored
+
+	if debug:
+		print('Steady-state GA with %d individuals on %d workers' % (n_individuals, n_workers))
+	progress = bounds.SearchProgress(jobs, existing_jobs, initial_date, workday_start, workday_end, history, debug)
+	if debug:
+		print('Generation  - Best - spread - evaluations/s - gap')
+
+	pending = {}
+	reason = None
+	try:
+		while reason == None:
+			# Keep every worker busy
+			while len(pending) < in_flight*n_workers:
+				child = next_child()
+				key = (work_hours, engine.canonical(child))
+				result = cache.get(key)
+				if result != None:
+					add(child, *result)
+					# Don't go round forever if everything is already in the cache
+					if not n_scored % n_individuals:
+						break
+					continue
+				# Once the population is full, a child has to beat the worst one to get in, so there's no need to
+				# finish decoding any that can't. The worst only gets better while the child is away.
+				cutoff = scores[-1] - 1 if len(population) == n_individuals else None
+				future = pool.submit(child, work_hours, cutoff)
+				pending[future] = (child, key)
+
+			done, not_done = wait(list(pending), return_when=FIRST_COMPLETED)
+			for future in done:
+				child, key = pending.pop(future)
+				result = future.result()
+				if result[0] != None:
+					cache.put(key, result)
+				history['evaluations'] += 1
+				add(child, *result)
+
+			# Check the stopping rules once a generation's worth of scores have come back
+			generation = n_scored // n_individuals
+			if generation > len(best_scores):
+				if not scores:
+					if debug:
+						print("I couldn't find a solution to this set of jobs.")
+					break
+				spread = bounds.spread(scores, progress.bound)
+				best_scores.append(scores[0])
+				spreads.append(spread)
+
+				gap = progress.record_gap(best_score)
+				if debug:
+					print('      %3d   - %4d - %6.2lf - %13.1lf - %.1lf%%' % (
+						generation, scores[0], spread, history['evaluations']/progress.seconds(), 100*gap))
+
+				stale = (n_scored - last_improvement) // n_individuals
+				reason = progress.stop_reason(config, generation, stale, spread, best_score)
+	finally:
+		for future in pending:
+			future.cancel()
+		pool.close()
+
+	history['generations'] = len(best_scores)
+	seconds = progress.finish()
+
+	if debug:
+		if reason != None:
+			print(reason)
+		print('Scored %d chromosomes in %.1lfs (%.1lf/s), and reused %d scores' % (
+			history['evaluations'], seconds, history['evaluations_per_second'], cache.hits))
+		if best_individual is not None:
+			print('The best individual was %s' % ''.join([str(x) for x in best_individual]))
+
+	return best_individual, history